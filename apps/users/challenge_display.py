@@ -0,0 +1,103 @@
+# apps/users/challenge_display.py
+import re
+
+OPTION_RE = re.compile(r"^(.*?)\s*(\(#([^)]*)\))?$")
+
+
+def normalize_label(label):
+    return re.sub(r"\s+", "", label).lower()
+
+
+def parse_radio_values(value_string):
+    options = []
+    for raw in value_string.split(","):
+        raw = raw.strip()
+        match = OPTION_RE.match(raw)  # Захватываем любые символы между "(#" и ")"
+        if match:
+            label = match.group(1).strip()
+            color_match = match.group(3)  # Извлекаем цвет из группы 3, если он есть
+            color = f"#{color_match}" if color_match else None  # Добавляем "#" перед цветом, если он найден
+            options.append({"label": label, "color": color})
+    return options
+
+
+def compile_options(value_string):
+    """
+    Схема вариантов для ChallengeElement.options_schema: исходная строка варианта,
+    метка, цвет и нормализованный ключ для сравнения с ответами.
+    """
+    if not value_string:
+        return []
+    schema = []
+    for raw in value_string.split(","):
+        raw = raw.strip()
+        [option] = parse_radio_values(raw) or [{"label": raw, "color": None}]
+        schema.append({
+            'value': raw,
+            'label': option['label'],
+            'color': option['color'],
+            'key': normalize_label(option['label']),
+        })
+    return schema
+
+
+class AttemptRenderModel:
+    """
+    Готовит попытки челленджа к выводу без запросов к БД: ответы берутся
+    из prefetch (attempts__answers), цвета — из скомпилированной схемы элементов.
+    """
+
+    def __init__(self, elements, display_settings=None):
+        self.elements = {element.pk: element for element in elements}
+        self.colors = {pk: element.color_map for pk, element in self.elements.items() if element.value}
+        self.display_settings = display_settings
+
+    def match_color(self, element_id, value):
+        return self.colors.get(element_id, {}).get(normalize_label(value))
+
+    def answer_index(self, attempt):
+        # первый ответ на элемент, как attempt.answers.filter(element=...).first()
+        index = {}
+        for answer in attempt.answers.all():
+            index.setdefault(answer.element_id, answer)
+        return index
+
+    def block_color(self, attempt):
+        for answer in attempt.answers.all():
+            color = self.match_color(answer.element_id, answer.answer)
+            if color:
+                return color
+        return None
+
+    def cell(self, element, answers):
+        answer = answers.get(element.pk)
+        value = answer.answer if answer else "—"
+        color = None
+        if element.field_type == 'radio':
+            color = self.match_color(element.pk, value)
+        return value, color
+
+    def render(self, attempt, display_type):
+        answers = self.answer_index(attempt)
+        attempt.block_color = self.block_color(attempt)
+
+        if display_type == 'text':
+            attempt.text_display = []
+            if self.display_settings:
+                for field in self.display_settings.text_fields.all():
+                    value, color = self.cell(field.element, answers)
+                    attempt.text_display.append({
+                        'label': field.element.name,
+                        'value': value,
+                        'color': color
+                    })
+
+        elif display_type == 'table':
+            attempt.table_cells = []
+            for column in self.display_settings.table_columns.all():
+                value, color = self.cell(column.element, answers) if column.element else ("—", None)
+                attempt.table_cells.append({
+                    'value': value,
+                    'color': color
+                })
+        return attempt
@@ -0,0 +1,213 @@
+# apps/users/challenge_submissions.py
+import datetime
+import logging
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .direct_uploads import get_answer_file
+from .models import Challenge, ChallengeUserAnswer, ChallengeUserAttempt, ChallengeUserChoice, Content
+from .points import award_points, content_key
+from .tasks import process_uploaded_file
+
+logger = logging.getLogger(__name__)
+
+OTHER_VALUE = "__other__"
+CHOICE_ELEMENTS = ('radio', 'checkbox')
+
+ANSWER_UPDATE_FIELDS = [
+    'answer', 'file', 'processing_status', 'processing_error',
+    'processed_file', 'duration_seconds', 'video_codec', 'poster_asset',
+]
+
+
+def read_answer(request, element):
+    """Ответ на элемент из формы (строка, файл или ключ прямой загрузки) или None."""
+    field_name = f"field_{element.id}"
+    other_value = request.POST.get(f"{field_name}_other", "").strip()
+
+    if element.element == 'file':
+        return get_answer_file(request, element)
+
+    if element.element == 'checkbox':
+        values = request.POST.getlist(field_name)
+        if OTHER_VALUE in values:
+            values = [v for v in values if v != OTHER_VALUE]
+            if other_value:
+                values.append(other_value)
+        value = ",".join(values)
+    elif element.element == 'radio':
+        value = request.POST.get(field_name, "")
+        if value == OTHER_VALUE:
+            value = other_value
+    else:  # input, textarea, date
+        value = request.POST.get(field_name, "").strip()
+
+    return value or None
+
+
+def validate_answer(element, value):
+    # варианты и файлы не проверяем, свободный ввод — по типу данных элемента
+    if element.element in CHOICE_ELEMENTS or element.element == 'file':
+        return
+    try:
+        if element.field_type == 'int':
+            int(value)
+        elif element.field_type == 'float':
+            float(value.replace(',', '.'))
+        elif element.field_type == 'date':
+            datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError(f'"{element.name}": enter a valid {element.get_field_type_display().lower()}')
+
+
+def collect_answers(request, elements, clear_choices=False):
+    """
+    Читает и проверяет ответы на все элементы до записи в БД.
+    clear_choices — при редактировании снятый выбор сохраняется пустой строкой.
+    """
+    answers = []
+    for element in elements:
+        value = read_answer(request, element)
+        if value is None:
+            if clear_choices and element.element in CHOICE_ELEMENTS:
+                answers.append((element, ""))
+            continue
+        validate_answer(element, value)
+        answers.append((element, value))
+    return answers
+
+
+def store_files(answers):
+    """
+    Загружает файлы из request.FILES в хранилище до транзакции, чтобы она
+    не держалась на время сетевой загрузки. Прямые загрузки уже лежат в Storj
+    и передаются ключом. Возвращает ответы с именами файлов и список
+    загруженных здесь имён (на случай отката).
+    """
+    field = ChallengeUserAnswer._meta.get_field('file')
+    stored, uploaded = [], []
+    try:
+        for element, value in answers:
+            if element.element == 'file' and not isinstance(value, str):
+                value = field.storage.save(field.generate_filename(None, value.name), value, max_length=field.max_length)
+                uploaded.append(value)
+            stored.append((element, value))
+    except Exception:
+        discard_files(uploaded)
+        raise
+    return stored, uploaded
+
+
+def discard_files(names):
+    storage = ChallengeUserAnswer._meta.get_field('file').storage
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception("Could not delete answer file %s", name)
+
+
+def build_answer(attempt, element, value):
+    if element.element == 'file':
+        # bulk_create не вызывает save(), статус обработки ставим сами
+        return ChallengeUserAnswer(attempt=attempt, element=element, answer='', file=value, processing_status='pending')
+    return ChallengeUserAnswer(attempt=attempt, element=element, answer=value)
+
+
+def queue_file_processing(answers):
+    answer_ids = [answer.pk for answer in answers if answer.file]
+    if answer_ids:
+        transaction.on_commit(lambda: [process_uploaded_file.delay(answer_id) for answer_id in answer_ids])
+
+
+def complete_challenge(user, challenge, choice):
+    """
+    Отмечает челлендж выполненным, когда попыток набралось достаточно.
+    Условный UPDATE: баллы начислятся один раз даже при параллельных отправках.
+    """
+    if choice.attempts.count() < challenge.min_answers_required:
+        return False
+    if not ChallengeUserChoice.objects.filter(pk=choice.pk, is_done=False).update(is_done=True):
+        return False
+
+    choice.is_done = True
+    award_points(user, challenge.points, content_key(challenge), 'challenge')
+
+    content = Content.objects.filter(
+        object_id=challenge.pk,
+        content_type=ContentType.objects.get_for_model(Challenge),
+    ).first()
+    if content:
+        user.completed_content.add(content)
+    return True
+
+
+def submit_attempt(request, challenge, complete=True):
+    """
+    Новая попытка со всеми ответами одной транзакцией: либо сохраняется
+    всё, либо ничего. complete — проверить выполнение челленджа и начислить баллы.
+    """
+    user = request.user
+    answers, uploaded = store_files(collect_answers(request, challenge.elements.all()))
+
+    try:
+        with transaction.atomic():
+            choice, _ = ChallengeUserChoice.objects.get_or_create(user=user, challenge=challenge)
+            attempt = ChallengeUserAttempt.objects.create(choice=choice, is_secondary=True)
+
+            created = ChallengeUserAnswer.objects.bulk_create(
+                [build_answer(attempt, element, value) for element, value in answers]
+            )
+            queue_file_processing(created)
+
+            if complete:
+                complete_challenge(user, challenge, choice)
+    except Exception:
+        discard_files(uploaded)
+        raise
+
+    return attempt
+
+
+def update_attempt(request, attempt):
+    """Правка попытки из формы редактирования: новые ответы вставляются, старые обновляются пачкой."""
+    challenge = attempt.choice.challenge
+    # форма редактирования показывает только элементы без show_after_confirm
+    elements = [element for element in challenge.elements.all() if not element.show_after_confirm]
+    answers, uploaded = store_files(collect_answers(request, elements, clear_choices=True))
+
+    replaced_files = []
+    try:
+        with transaction.atomic():
+            existing = {}
+            for answer in attempt.answers.all():
+                existing.setdefault(answer.element_id, answer)
+
+            new_answers, changed_answers = [], []
+            for element, value in answers:
+                answer = existing.get(element.pk)
+                if answer is None:
+                    new_answers.append(build_answer(attempt, element, value))
+                    continue
+
+                if element.element == 'file':
+                    if answer.file and answer.file.name != value:
+                        replaced_files.append(answer.file.name)
+                    answer.file = value
+                    answer.reset_processing()
+                else:
+                    answer.answer = value
+                changed_answers.append(answer)
+
+            created = ChallengeUserAnswer.objects.bulk_create(new_answers)
+            if changed_answers:
+                ChallengeUserAnswer.objects.bulk_update(changed_answers, ANSWER_UPDATE_FIELDS)
+            queue_file_processing(created + [answer for answer in changed_answers if answer.processing_status == 'pending'])
+            transaction.on_commit(lambda: discard_files(replaced_files))
+    except Exception:
+        discard_files(uploaded)
+        raise
+
+    return attempt
@@ -0,0 +1,171 @@
+# apps/users/chitchat.py
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import ChitChatAnswer, ChitChatOption, ChitChatUserChoice
+
+TALLY_FIELDS = ('option_1_count', 'option_2_count')
+RECONCILE_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def parse_answers(chitchat, data):
+    """
+    {option_id: answer} из полей pair-<id>. Пары проверяются одним запросом:
+    чужие и несуществующие пары, а также ответы не из пары пропускаются.
+    """
+    posted = {}
+    for key, value in data.items():
+        if key.startswith('pair-'):
+            try:
+                posted[int(key.split('-')[1])] = value
+            except ValueError:
+                logger.warning(f"Invalid option id: {key}")
+
+    options = {
+        option_id: (option_1, option_2)
+        for option_id, option_1, option_2 in ChitChatOption.objects.filter(
+            title=chitchat, pk__in=posted
+        ).values_list('pk', 'option_1', 'option_2')
+    }
+
+    answers = {}
+    for option_id, value in posted.items():
+        if option_id not in options:
+            logger.warning(f"Missing option for chitchat {chitchat.pk}: pair-{option_id}")
+        elif value not in options[option_id]:
+            logger.warning(f"Answer is not one of the pair options: pair-{option_id}={value!r}")
+        else:
+            answers[option_id] = value
+    return answers
+
+
+def save_answers(user_choice, answers):
+    """
+    Заменяет ответы пользователя на answers {option_id: answer}: пишутся только
+    изменения, повторная отправка тех же ответов ничего не меняет.
+    Счётчики вариантов сдвигаются в той же транзакции.
+    Возвращает число изменившихся пар.
+    """
+    with transaction.atomic():
+        # блокируем выбор пользователя: параллельная отправка не посчитает ответы дважды
+        ChitChatUserChoice.objects.select_for_update().only('pk').get(pk=user_choice.pk)
+        previous = dict(
+            ChitChatAnswer.objects.filter(user_choice=user_choice).values_list('option_pair_id', 'answer')
+        )
+
+        removed = [option_id for option_id in previous if option_id not in answers]
+        changed = {option_id: answer for option_id, answer in answers.items() if previous.get(option_id) != answer}
+
+        if removed:
+            ChitChatAnswer.objects.filter(user_choice=user_choice, option_pair_id__in=removed).delete()
+        if changed:
+            ChitChatAnswer.objects.bulk_create(
+                [
+                    ChitChatAnswer(user_choice=user_choice, option_pair_id=option_id, answer=answer)
+                    for option_id, answer in changed.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['user_choice', 'option_pair'],
+                update_fields=['answer'],
+            )
+
+        if removed or changed:
+            update_tallies(previous, answers, [*removed, *changed])
+
+    return len(removed) + len(changed)
+
+
+def tally_field(option, answer):
+    """Поле счётчика для ответа или None, если ответ не совпадает ни с одним вариантом."""
+    option_1, option_2 = option
+    if answer is not None and answer == option_1:
+        return 'option_1_count'
+    if answer is not None and answer == option_2:
+        return 'option_2_count'
+    return None
+
+
+def update_tallies(previous, answers, option_ids):
+    """
+    Сдвигает счётчики по изменившимся парам одним UPDATE: -1 старому ответу,
+    +1 новому. Ответы, не совпадающие с текущими вариантами (пару
+    переименовали), пропускаются — их поправит сверка.
+    """
+    options = {
+        option_id: (option_1, option_2)
+        for option_id, option_1, option_2 in ChitChatOption.objects.filter(
+            pk__in=option_ids
+        ).values_list('pk', 'option_1', 'option_2')
+    }
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for option_id, option in options.items():
+        old_field = tally_field(option, previous.get(option_id))
+        new_field = tally_field(option, answers.get(option_id))
+        if old_field != new_field:
+            if old_field:
+                deltas[old_field][option_id] -= 1
+            if new_field:
+                deltas[new_field][option_id] += 1
+
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    """
+    Сдвигает счётчики {field: {option_id: delta}} одним UPDATE относительно
+    текущих значений в БД, поэтому параллельные сдвиги не теряются.
+    """
+    option_ids = {option_id for field_deltas in deltas.values() for option_id in field_deltas}
+    if not option_ids:
+        return
+    ChitChatOption.objects.filter(pk__in=option_ids).update(**{
+        field: Greatest(
+            F(field) + Case(
+                *[When(pk=option_id, then=Value(delta)) for option_id, delta in field_deltas.items()],
+                default=Value(0),
+            ),
+            Value(0),
+        )
+        for field, field_deltas in deltas.items()
+        if field_deltas
+    })
+
+
+def reconcile_tallies(chitchat_id=None):
+    """
+    Пересчитывает счётчики из ChitChatAnswer и исправляет расхождения
+    (каскадные удаления, правка текста вариантов). Возвращает число исправленных пар.
+    Поправка применяется разницей (actual - stored) к текущему значению, а не
+    записью абсолютного числа: отправки ответов во время сверки не затираются.
+    """
+    options = ChitChatOption.objects.all()
+    if chitchat_id is not None:
+        options = options.filter(title_id=chitchat_id)
+
+    options = options.annotate(
+        actual_1=Count('chitchatanswer', filter=Q(chitchatanswer__answer=F('option_1'))),
+        actual_2=Count('chitchatanswer', filter=Q(chitchatanswer__answer=F('option_2')) & ~Q(option_2=F('option_1'))),
+    ).only('pk', *TALLY_FIELDS)
+
+    # счётчики и Count() читаются одним запросом, то есть из одного снимка
+    deltas = {field: {} for field in TALLY_FIELDS}
+    for option in options.iterator(chunk_size=2000):
+        for field, actual in zip(TALLY_FIELDS, (option.actual_1, option.actual_2)):
+            if actual != getattr(option, field):
+                deltas[field][option.pk] = actual - getattr(option, field)
+
+    drifted = sorted(set(deltas['option_1_count']) | set(deltas['option_2_count']))
+    for i in range(0, len(drifted), RECONCILE_BATCH_SIZE):
+        batch = set(drifted[i:i + RECONCILE_BATCH_SIZE])
+        apply_deltas({
+            field: {option_id: delta for option_id, delta in field_deltas.items() if option_id in batch}
+            for field, field_deltas in deltas.items()
+        })
+    return len(drifted)
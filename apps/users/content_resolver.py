@@ -0,0 +1,65 @@
+# apps/users/content_resolver.py
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+
+
+class ContentResolver:
+    """
+    Объекты GenericForeignKey по парам (content_type_id, object_id): один in_bulk
+    на тип, ContentType из общего кэша Django, уже загруженные объекты повторно
+    не запрашиваются. Экземпляр рассчитан на один запрос.
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    def resolve(self, pairs):
+        """{(content_type_id, object_id): объект или None}"""
+        pairs = [(content_type_id, object_id) for content_type_id, object_id in pairs
+                 if content_type_id and object_id is not None]
+
+        missing = defaultdict(set)
+        for content_type_id, object_id in pairs:
+            if (content_type_id, object_id) not in self.objects:
+                missing[content_type_id].add(object_id)
+
+        for content_type_id, object_ids in missing.items():
+            try:
+                model = ContentType.objects.get_for_id(content_type_id).model_class()
+            except ContentType.DoesNotExist:
+                model = None
+            found = model._base_manager.in_bulk(object_ids) if model else {}
+            for object_id in object_ids:
+                self.objects[(content_type_id, object_id)] = found.get(object_id)
+
+        return {pair: self.objects[pair] for pair in pairs}
+
+    def get(self, content_type_id, object_id):
+        return self.resolve([(content_type_id, object_id)]).get((content_type_id, object_id))
+
+    def attach(self, instances, field_name):
+        """
+        Заполняет кэш GenericForeignKey field_name (content.value, fav.content_object)
+        у всех instances, после чего обращение к полю не делает запросов.
+        """
+        instances = list(instances)
+        if not instances:
+            return instances
+
+        field = instances[0]._meta.get_field(field_name)
+        ct_attname = instances[0]._meta.get_field(field.ct_field).attname
+        keys = [(getattr(instance, ct_attname), getattr(instance, field.fk_field)) for instance in instances]
+
+        objects = self.resolve(keys)
+        for instance, key in zip(instances, keys):
+            field.set_cached_value(instance, objects.get(key))
+        return instances
+
+
+def get_content_object(instance, field_name):
+    """Объект GenericForeignKey одного экземпляра: из кэша поля или через ContentResolver."""
+    field = instance._meta.get_field(field_name)
+    if not field.is_cached(instance):
+        ContentResolver().attach([instance], field_name)
+    return field.get_cached_value(instance)
@@ -0,0 +1,132 @@
+# apps/users/direct_uploads.py
+import os
+import uuid
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.utils.text import get_valid_filename
+from botocore.exceptions import ClientError
+
+from .storage_backends import StorjVideoStorage
+
+UPLOAD_SALT = 'challenge-answer-upload'
+UPLOAD_URL_EXPIRES = 60 * 60
+UPLOAD_TOKEN_MAX_AGE = 60 * 60 * 24
+
+# S3 требует части от 5 МБ; крупные файлы грузим частями по 64 МБ
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+MULTIPART_PART_SIZE = 64 * 1024 * 1024
+MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024
+
+storage = StorjVideoStorage()
+
+
+def get_client():
+    return storage.connection.meta.client
+
+
+def build_answer_key(filename):
+    # тот же каталог, что и у ChallengeUserAnswer.file (upload_to='usersvideo')
+    name = get_valid_filename(os.path.basename(filename)) or 'video'
+    return f"usersvideo/{uuid.uuid4().hex}/{name}"
+
+
+def start_upload(user, element, filename, content_type, size):
+    """
+    Выдаёт браузеру адрес(а) для загрузки прямо в Storj и подписанный токен,
+    который потом отправляется вместе с формой вместо файла.
+    """
+    if element.element != 'file':
+        raise ValidationError("Element does not accept files")
+    if not size or size > MAX_UPLOAD_SIZE:
+        raise ValidationError("File is too big: Upload your video!")
+
+    key = build_answer_key(filename)
+    content_type = content_type or 'application/octet-stream'
+    client = get_client()
+    params = {'Bucket': storage.bucket_name, 'Key': key}
+
+    result = {}
+    if size <= MULTIPART_THRESHOLD:
+        result['url'] = client.generate_presigned_url(
+            'put_object',
+            Params={**params, 'ContentType': content_type},
+            ExpiresIn=UPLOAD_URL_EXPIRES,
+        )
+        upload_id = None
+    else:
+        upload_id = client.create_multipart_upload(**params, ContentType=content_type)['UploadId']
+        parts_count = (size + MULTIPART_PART_SIZE - 1) // MULTIPART_PART_SIZE
+        result['part_size'] = MULTIPART_PART_SIZE
+        result['part_urls'] = [
+            client.generate_presigned_url(
+                'upload_part',
+                Params={**params, 'UploadId': upload_id, 'PartNumber': number},
+                ExpiresIn=UPLOAD_URL_EXPIRES,
+            )
+            for number in range(1, parts_count + 1)
+        ]
+
+    result['token'] = signing.dumps(
+        {'key': key, 'user': user.pk, 'element': element.pk, 'upload_id': upload_id},
+        salt=UPLOAD_SALT,
+    )
+    return result
+
+
+def _load_token(token, user, element=None):
+    try:
+        data = signing.loads(token, salt=UPLOAD_SALT, max_age=UPLOAD_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        raise ValidationError("Upload token is invalid or expired")
+
+    if data['user'] != user.pk or (element is not None and data['element'] != element.pk):
+        raise ValidationError("Upload token does not belong to this answer")
+    return data
+
+
+def complete_upload(token, user, parts):
+    """Собирает multipart-загрузку из частей, которые браузер уже отправил."""
+    data = _load_token(token, user)
+    if not data['upload_id']:
+        return
+
+    parts = sorted(
+        ({'PartNumber': int(part['PartNumber']), 'ETag': part['ETag']} for part in parts),
+        key=lambda part: part['PartNumber'],
+    )
+    get_client().complete_multipart_upload(
+        Bucket=storage.bucket_name,
+        Key=data['key'],
+        UploadId=data['upload_id'],
+        MultipartUpload={'Parts': parts},
+    )
+
+
+def resolve_upload(token, user, element):
+    """
+    Ключ загруженного объекта для ChallengeUserAnswer.file.
+    Проверяет подпись токена и что объект действительно лежит в бакете.
+    """
+    data = _load_token(token, user, element)
+    try:
+        get_client().head_object(Bucket=storage.bucket_name, Key=data['key'])
+    except ClientError:
+        raise ValidationError("Uploaded file was not found")
+    return data['key']
+
+
+def get_answer_file(request, element):
+    """
+    Файл ответа из формы: обычный request.FILES или ключ объекта,
+    загруженного напрямую (поле field_<id>_upload с токеном).
+    """
+    field_name = f"field_{element.id}"
+    uploaded_file = request.FILES.get(field_name)
+    if uploaded_file:
+        return uploaded_file
+
+    token = request.POST.get(f"{field_name}_upload")
+    if token:
+        return resolve_upload(token, request.user, element)
+    return None
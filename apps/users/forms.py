@@ -93,18 +93,12 @@ class FunFactForm(forms.ModelForm):
     class Meta:
         model = FunFact
         fields = ['title', 'fact_description', 'photo', 'points']
-        widgets = {
-            'photo_base64': forms.TextInput(attrs={'readonly': 'readonly'})
-        }
 
 
 class VideoForm(forms.ModelForm):
     class Meta:
         model = Video
         fields = ['title', 'description', 'video_file', 'duration', 'points', 'poster_url']
-        widgets = {
-            'poster_base64': forms.TextInput(attrs={'readonly': 'readonly'})
-        }
 
 
 class ChitChatChoiceForm(forms.Form):
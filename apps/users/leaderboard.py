@@ -0,0 +1,239 @@
+# apps/users/leaderboard.py
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Sum
+
+from .models import User, UserSchool, Content, PointsTransaction
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'leaderboard'
+
+
+def global_board():
+    return f"{KEY_PREFIX}:global"
+
+
+def school_board(code):
+    return f"{KEY_PREFIX}:school:{code}"
+
+
+def page_board(page_id):
+    return f"{KEY_PREFIX}:page:{page_id}"
+
+
+class RedisLeaderboardBackend:
+    """Sorted set на доску: ZINCRBY/ZREVRANK/ZREVRANGE — всё O(log n)."""
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def incr(self, board, member, amount):
+        self.client.zincrby(board, amount, member)
+
+    def set(self, board, member, score):
+        self.client.zadd(board, {member: score})
+
+    def remove(self, board, member):
+        self.client.zrem(board, member)
+
+    def replace(self, board, scores):
+        pipe = self.client.pipeline()
+        pipe.delete(board)
+        if scores:
+            pipe.zadd(board, scores)
+        pipe.execute()
+
+    def rank(self, board, member):
+        return self.client.zrevrank(board, member)
+
+    def range(self, board, start, end):
+        return [(int(member), int(score)) for member, score in self.client.zrevrange(board, start, end, withscores=True)]
+
+    def boards(self):
+        return [key.decode() for key in self.client.scan_iter(f"{KEY_PREFIX}:*")]
+
+
+class LocalLeaderboardBackend:
+    """
+    Замена Redis в памяти процесса для разработки и тестов (без REDIS_URL).
+    Ранги считаются сортировкой, для продакшена не годится.
+    """
+
+    def __init__(self):
+        self.data = defaultdict(dict)
+        self.lock = threading.Lock()
+
+    def incr(self, board, member, amount):
+        with self.lock:
+            self.data[board][member] = self.data[board].get(member, 0) + amount
+
+    def set(self, board, member, score):
+        with self.lock:
+            self.data[board][member] = score
+
+    def remove(self, board, member):
+        with self.lock:
+            self.data[board].pop(member, None)
+
+    def replace(self, board, scores):
+        with self.lock:
+            self.data[board] = dict(scores)
+
+    def _ordered(self, board):
+        # как в Redis: по убыванию очков, при равенстве — по убыванию member
+        return sorted(self.data[board].items(), key=lambda item: (item[1], str(item[0])), reverse=True)
+
+    def rank(self, board, member):
+        with self.lock:
+            for index, (item, _) in enumerate(self._ordered(board)):
+                if item == member:
+                    return index
+        return None
+
+    def range(self, board, start, end):
+        # отрицательные индексы — с конца, как у ZREVRANGE
+        with self.lock:
+            rows = self._ordered(board)
+            if start < 0:
+                start = max(len(rows) + start, 0)
+            if end < 0:
+                end = len(rows) + end
+            return [(int(member), int(score)) for member, score in rows[start:end + 1]]
+
+    def boards(self):
+        return list(self.data)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                url = getattr(settings, 'LEADERBOARD_REDIS_URL', None)
+                _backend = RedisLeaderboardBackend(url) if url else LocalLeaderboardBackend()
+    return _backend
+
+
+def school_codes(user_id):
+    return list(
+        UserSchool.objects.filter(user_id=user_id, assigned_code__isnull=False)
+        .values_list('assigned_code', flat=True).distinct()
+    )
+
+
+def content_pages(key):
+    """Страницы контента по ключу журнала ('video:12'), для остальных ключей — пусто."""
+    model, _, object_id = key.partition(':')
+    if not object_id.isdigit():
+        return []
+    return list(
+        Content.objects.filter(content_type__model=model, object_id=int(object_id), page__isnull=False)
+        .values_list('page_id', flat=True).distinct()
+    )
+
+
+def record_points(user_id, amount, key):
+    """
+    Инкрементальное обновление досок после начисления/списания.
+    Ошибки Redis не должны ломать начисление — только лог.
+    """
+    try:
+        backend = get_backend()
+        backend.incr(global_board(), user_id, amount)
+        for code in school_codes(user_id):
+            backend.incr(school_board(code), user_id, amount)
+        if amount > 0:
+            for page_id in content_pages(key):
+                backend.incr(page_board(page_id), user_id, amount)
+    except Exception:
+        logger.exception("Leaderboard update failed for user %s", user_id)
+
+
+def sync_user_schools(user_id):
+    """Переносит пользователя на доски его текущих школ."""
+    try:
+        backend = get_backend()
+        points = User.objects.filter(pk=user_id).values_list('points_count', flat=True).first() or 0
+        codes = set(school_codes(user_id))
+        for board in backend.boards():
+            if board.startswith(f"{KEY_PREFIX}:school:") and board not in {school_board(c) for c in codes}:
+                backend.remove(board, user_id)
+        for code in codes:
+            backend.set(school_board(code), user_id, points)
+    except Exception:
+        logger.exception("Leaderboard school sync failed for user %s", user_id)
+
+
+def _entries(board, start, end):
+    rows = get_backend().range(board, max(start, 0), end)
+    users = User.objects.in_bulk([user_id for user_id, _ in rows])
+    return [
+        {
+            'rank': max(start, 0) + index + 1,
+            'user_id': user_id,
+            'username': users[user_id].username if user_id in users else None,
+            'points': points,
+        }
+        for index, (user_id, points) in enumerate(rows)
+    ]
+
+
+def top(board, limit=10):
+    if limit < 1:
+        # ZREVRANGE 0 -1 вернул бы всю доску
+        return []
+    return _entries(board, 0, limit - 1)
+
+
+def around(board, user_id, neighbours=2):
+    """Позиция пользователя и по neighbours соседей сверху и снизу."""
+    rank = get_backend().rank(board, user_id)
+    if rank is None:
+        return []
+    return _entries(board, rank - neighbours, rank + neighbours)
+
+
+def rebuild():
+    """Пересобирает все доски из БД. Возвращает число досок."""
+    backend = get_backend()
+
+    global_scores = dict(User.objects.filter(is_active=True).values_list('pk', 'points_count'))
+
+    school_scores = defaultdict(dict)
+    for user_id, code in UserSchool.objects.filter(assigned_code__isnull=False).values_list('user_id', 'assigned_code'):
+        if user_id in global_scores:
+            school_scores[code][user_id] = global_scores[user_id]
+
+    # очки по страницам — из журнала начислений за контент
+    models_by_id = dict(ContentType.objects.values_list('pk', 'model'))
+    pages_by_key = defaultdict(set)
+    for content_type_id, object_id, page_id in Content.objects.filter(page__isnull=False).values_list(
+        'content_type_id', 'object_id', 'page_id'
+    ):
+        pages_by_key[f"{models_by_id.get(content_type_id)}:{object_id}"].add(page_id)
+
+    page_scores = defaultdict(lambda: defaultdict(int))
+    earned = PointsTransaction.objects.filter(amount__gt=0).values('user_id', 'key').annotate(total=Sum('amount'))
+    for row in earned:
+        for page_id in pages_by_key.get(row['key'], ()):
+            page_scores[page_id][row['user_id']] += row['total']
+
+    boards = {global_board(): global_scores}
+    boards.update({school_board(code): scores for code, scores in school_scores.items()})
+    boards.update({page_board(page_id): dict(scores) for page_id, scores in page_scores.items()})
+
+    for board in set(backend.boards()) - set(boards):
+        backend.replace(board, {})
+    for board, scores in boards.items():
+        backend.replace(board, scores)
+    return len(boards)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum, Count
+
+from apps.users.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Recalculate stored points and questions totals for every quiz'
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.annotate(
+            points_sum=Sum('questions__points'),
+            questions_num=Count('questions'),
+        )
+
+        updated = []
+        for quiz in quizzes:
+            points = quiz.points_sum or 0
+            if quiz.points_total != points or quiz.questions_total != quiz.questions_num:
+                quiz.points_total = points
+                quiz.questions_total = quiz.questions_num
+                updated.append(quiz)
+
+        Quiz.objects.bulk_update(updated, ['points_total', 'questions_total'], batch_size=500)
+        self.stdout.write(f"Updated {len(updated)} of {len(quizzes)} quizzes")
@@ -1,8 +1,11 @@
 from django.core.management.base import BaseCommand
+from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 import os
 import logging
 
+from utils.supabase_storage import SupabaseStorage, get_latency_stats
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,6 +23,9 @@ class Command(BaseCommand):
         self.stdout.write("\nTesting bucket access...")
         self.test_bucket_access()
 
+        self.stdout.write("\nMeasuring Supabase storage latency...")
+        self.test_supabase_latency()
+
         self.stdout.write("\n===== Diagnosis Complete =====")
 
     def check_env_vars(self):
@@ -106,4 +112,25 @@ class Command(BaseCommand):
             logger.exception("File delete error")
             success = False
 
-        return success
\ No newline at end of file
+        return success
+
+    def test_supabase_latency(self):
+        """Запись, HEAD и удаление тестового файла в Supabase и задержки по операциям"""
+        storage = SupabaseStorage(bucket_name='profile_pictures')
+        test_file = 'diagnostic_latency_test.txt'
+
+        try:
+            name = storage.save(test_file, ContentFile(b'This is a latency test file'))
+            storage.size(name)
+            storage.exists(name)
+            storage.delete(name)
+        except Exception as e:
+            self.stdout.write(f"  ✗ Supabase request failed: {str(e)}")
+            logger.exception("Supabase latency test error")
+
+        # статистика собирается в памяти процесса, здесь — только запросы этой команды
+        for operation, entry in sorted(get_latency_stats().items()):
+            self.stdout.write(
+                f"  {operation}: {entry['count']} requests, {entry['errors']} errors, "
+                f"avg {entry['avg_ms']:.1f} ms, max {entry['max_ms']:.1f} ms"
+            )
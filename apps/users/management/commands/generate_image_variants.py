@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.models import ImageAsset
+
+
+class Command(BaseCommand):
+    help = 'Generate missing card/detail/admin variants for existing image assets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='store_true', help='Send work to Celery instead of running inline')
+
+    def handle(self, *args, **options):
+        from apps.users.tasks import generate_image_variants
+
+        sources = ImageAsset.objects.filter(source__isnull=True).exclude(variant='avatar').values_list('sha256', flat=True)
+
+        for sha256 in sources.iterator():
+            if options['queue']:
+                generate_image_variants.delay(sha256)
+                self.stdout.write(f"Queued {sha256[:12]}")
+            else:
+                asset = ImageAsset.objects.get(sha256=sha256)
+                created = asset.generate_variants()
+                self.stdout.write(f"{sha256[:12]}: {len(created)} variants created")
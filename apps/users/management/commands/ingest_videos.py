@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.users.models import Video
+from apps.users.tasks import ingest_video
+
+
+class Command(BaseCommand):
+    help = 'Compute duration in seconds and posters for videos that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='store_true', help='Send work to Celery instead of running inline')
+
+    def handle(self, *args, **options):
+        video_ids = list(
+            Video.objects.filter(Q(duration_seconds__isnull=True) | Q(poster_asset__isnull=True))
+            .values_list('pk', flat=True)
+        )
+
+        for video_id in video_ids:
+            if options['queue']:
+                ingest_video.delay(video_id)
+            else:
+                ingest_video(video_id)
+
+        self.stdout.write(f"Processed {len(video_ids)} videos")
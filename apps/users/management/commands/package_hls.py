@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.models import Video
+from apps.users.tasks import package_video_hls
+
+
+class Command(BaseCommand):
+    help = 'Package HLS renditions for videos that do not have a manifest yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='store_true', help='Send work to Celery instead of running inline')
+        parser.add_argument('--all', action='store_true', help='Repackage videos that already have a manifest')
+
+    def handle(self, *args, **options):
+        videos = Video.objects.exclude(video_file='')
+        if not options['all']:
+            videos = videos.filter(hls_manifest='')
+
+        video_ids = list(videos.values_list('pk', flat=True))
+        for video_id in video_ids:
+            if options['queue']:
+                package_video_hls.delay(video_id)
+            else:
+                package_video_hls(video_id)
+
+        self.stdout.write(f"Processed {len(video_ids)} videos")
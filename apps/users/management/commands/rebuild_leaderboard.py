@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.leaderboard import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild global, school and page leaderboards from the database'
+
+    def handle(self, *args, **options):
+        boards = rebuild()
+        self.stdout.write(f"Rebuilt {boards} leaderboards")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.chitchat import reconcile_tallies
+
+
+class Command(BaseCommand):
+    help = 'Recount Chit Chat option answer tallies and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chitchat', type=int, help='Only reconcile options of this chit chat')
+
+    def handle(self, *args, **options):
+        fixed = reconcile_tallies(options['chitchat'])
+        self.stdout.write(f"Fixed tallies for {fixed} option pairs")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.models import User
+from apps.users.tasks import render_user_avatar
+
+
+class Command(BaseCommand):
+    help = 'Render cached avatars for users that have a profile picture but no avatar yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='store_true', help='Send work to Celery instead of running inline')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(avatar_asset__isnull=True).exclude(profile_picture='')
+
+        count = 0
+        for user_id, name in users.values_list('pk', 'profile_picture'):
+            if options['queue']:
+                render_user_avatar.delay(user_id, name)
+            else:
+                render_user_avatar(user_id, name)
+            count += 1
+
+        self.stdout.write(f"Processed {count} users")
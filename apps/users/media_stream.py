@@ -0,0 +1,129 @@
+# apps/users/media_stream.py
+import hashlib
+import mimetypes
+import re
+
+from botocore.exceptions import ClientError
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+STREAM_CHUNK_SIZE = 256 * 1024
+# Один ответ держит sync-воркер gunicorn, поэтому 206 не длиннее окна:
+# плеер сам запросит следующий диапазон
+STREAM_MAX_RANGE = 8 * 1024 * 1024
+# Срок подписанной ссылки для редиректа больших файлов без Range
+REDIRECT_URL_EXPIRY = 60 * 5
+HEAD_CACHE_TIMEOUT = 60 * 5
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_object_meta(storage, key):
+    """size/etag/last_modified/content_type объекта; HEAD кэшируется на несколько минут."""
+    cache_key = f"media_head:{storage.bucket_name}:{hashlib.sha1(key.encode()).hexdigest()}"
+    meta = cache.get(cache_key)
+    if meta is not None:
+        return meta
+
+    try:
+        head = storage.connection.meta.client.head_object(Bucket=storage.bucket_name, Key=key)
+    except ClientError:
+        raise Http404("File not found")
+
+    meta = {
+        'size': head['ContentLength'],
+        'etag': head['ETag'],
+        'last_modified': int(head['LastModified'].timestamp()),
+        'content_type': head.get('ContentType') or mimetypes.guess_type(key)[0] or 'application/octet-stream',
+    }
+    cache.set(cache_key, meta, HEAD_CACHE_TIMEOUT)
+    return meta
+
+
+def parse_range(header, size):
+    """
+    (start, end) включительно для одного диапазона, None — отдать файл целиком,
+    False — диапазон не удовлетворим (416).
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-500 — последние 500 байт
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def stream_object(request, storage, key, cache_control):
+    """
+    Отдаёт объект из S3-хранилища потоком, с поддержкой Range/206,
+    ETag/Last-Modified и условных запросов. Байты не буферизуются.
+    Диапазон ограничен STREAM_MAX_RANGE; большой файл без Range
+    отдаётся редиректом в хранилище, а не через воркер.
+    """
+    meta = get_object_meta(storage, key)
+
+    response = get_conditional_response(request, etag=meta['etag'], last_modified=meta['last_modified'])
+    if response is None:
+        byte_range = parse_range(request.headers.get('Range'), meta['size'])
+
+        # If-Range: диапазон только если объект не поменялся
+        if_range = request.headers.get('If-Range')
+        if byte_range and if_range and if_range != meta['etag'] and parse_http_date_safe(if_range) != meta['last_modified']:
+            byte_range = None
+
+        if byte_range:
+            start, end = byte_range
+            byte_range = start, min(end, start + STREAM_MAX_RANGE - 1)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{meta['size']}"
+        elif byte_range is None and meta['size'] > STREAM_MAX_RANGE:
+            # короткоживущая подписанная ссылка на этот же ключ: storage.url()
+            # у Storj ведёт на публичный linkshare и теряет каталоги в ключе
+            url = storage.connection.meta.client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': storage.bucket_name, 'Key': key},
+                ExpiresIn=REDIRECT_URL_EXPIRY,
+            )
+            response = HttpResponseRedirect(url)
+            response['Cache-Control'] = 'private, no-store'
+            return response
+        else:
+            params = {'Bucket': storage.bucket_name, 'Key': key}
+            if byte_range:
+                params['Range'] = f"bytes={byte_range[0]}-{byte_range[1]}"
+            body = storage.connection.meta.client.get_object(**params)['Body']
+
+            response = StreamingHttpResponse(
+                body.iter_chunks(STREAM_CHUNK_SIZE),
+                status=206 if byte_range else 200,
+                content_type=meta['content_type'],
+            )
+            if byte_range:
+                start, end = byte_range
+                response['Content-Range'] = f"bytes {start}-{end}/{meta['size']}"
+                response['Content-Length'] = end - start + 1
+            else:
+                response['Content-Length'] = meta['size']
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = meta['etag']
+    response['Last-Modified'] = http_date(meta['last_modified'])
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_content_always_available'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='points_total',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total points'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='questions_total',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Questions count'),
+        ),
+    ]
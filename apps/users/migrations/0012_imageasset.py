@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_quiz_points_total_quiz_questions_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(editable=False, max_length=64, unique=True)),
+                ('mime_type', models.CharField(default='image/jpeg', max_length=50)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Image asset',
+                'verbose_name_plural': 'Image assets',
+            },
+        ),
+        migrations.AddField(
+            model_name='challenge',
+            name='picture_asset',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='users.imageasset', to_field='sha256'),
+        ),
+        migrations.AddField(
+            model_name='funfact',
+            name='photo_asset',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='users.imageasset', to_field='sha256'),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='poster_asset',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='users.imageasset', to_field='sha256'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+import base64
+import hashlib
+from io import BytesIO
+
+from PIL import Image
+from django.db import migrations
+
+# (модель, старое поле с base64, новая ссылка на ImageAsset)
+IMAGE_FIELDS = [
+    ('Video', 'poster_base64', 'poster_asset'),
+    ('FunFact', 'photo_base64', 'photo_asset'),
+    ('Challenge', 'picture_base64', 'picture_asset'),
+]
+
+
+def get_or_create_asset(ImageAsset, data):
+    sha256 = hashlib.sha256(data).hexdigest()
+    asset = ImageAsset.objects.filter(sha256=sha256).first()
+    if asset:
+        return asset
+
+    width = height = None
+    try:
+        width, height = Image.open(BytesIO(data)).size
+    except Exception:
+        pass
+
+    return ImageAsset.objects.create(
+        sha256=sha256,
+        mime_type='image/jpeg',
+        width=width,
+        height=height,
+        data=data,
+    )
+
+
+def move_base64_to_assets(apps, schema_editor):
+    ImageAsset = apps.get_model('users', 'ImageAsset')
+
+    for model_name, base64_field, asset_field in IMAGE_FIELDS:
+        model = apps.get_model('users', model_name)
+        rows = model.objects.exclude(**{f'{base64_field}__isnull': True}).exclude(**{base64_field: ''})
+
+        for obj in rows.only('pk', base64_field).iterator():
+            try:
+                data = base64.b64decode(getattr(obj, base64_field))
+            except (ValueError, TypeError):
+                continue
+
+            asset = get_or_create_asset(ImageAsset, data)
+            model.objects.filter(pk=obj.pk).update(**{f'{asset_field}_id': asset.sha256})
+
+
+def restore_base64_from_assets(apps, schema_editor):
+    ImageAsset = apps.get_model('users', 'ImageAsset')
+
+    for model_name, base64_field, asset_field in IMAGE_FIELDS:
+        model = apps.get_model('users', model_name)
+        rows = model.objects.exclude(**{f'{asset_field}__isnull': True})
+
+        for obj in rows.only('pk', f'{asset_field}_id').iterator():
+            asset = ImageAsset.objects.get(sha256=getattr(obj, f'{asset_field}_id'))
+            encoded = base64.b64encode(bytes(asset.data)).decode('utf-8')
+            model.objects.filter(pk=obj.pk).update(**{base64_field: encoded})
+
+    # Копии постеров в Content и Favourites
+    Video = apps.get_model('users', 'Video')
+    Content = apps.get_model('users', 'Content')
+    Favourites = apps.get_model('users', 'Favourites')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    video_ct = ContentType.objects.filter(app_label='users', model='video').first()
+    if video_ct:
+        for video in Video.objects.exclude(poster_base64__isnull=True).only('pk', 'poster_base64').iterator():
+            Content.objects.filter(content_type=video_ct, object_id=video.pk).update(poster_base64=video.poster_base64)
+            Favourites.objects.filter(content_type=video_ct, object_id=video.pk).update(poster_base64=video.poster_base64)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_imageasset'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_base64_to_assets, restore_base64_from_assets),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_move_base64_to_imageasset'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='challenge',
+            name='picture_base64',
+        ),
+        migrations.RemoveField(
+            model_name='content',
+            name='poster_base64',
+        ),
+        migrations.RemoveField(
+            model_name='favourites',
+            name='poster_base64',
+        ),
+        migrations.RemoveField(
+            model_name='funfact',
+            name='photo_base64',
+        ),
+        migrations.RemoveField(
+            model_name='video',
+            name='poster_base64',
+        ),
+    ]
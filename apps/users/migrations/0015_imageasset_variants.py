@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_remove_base64_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageasset',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='users.imageasset', to_field='sha256'),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='variant',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='imageasset',
+            index=models.Index(fields=['source', 'variant'], name='users_image_source__3c186a_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:00
+
+import apps.users.storage_backends
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_user_avatar_asset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challengeuseranswer',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='challengeuseranswer',
+            name='poster_asset',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='users.imageasset', to_field='sha256'),
+        ),
+        migrations.AddField(
+            model_name='challengeuseranswer',
+            name='processed_file',
+            field=models.FileField(blank=True, editable=False, storage=apps.users.storage_backends.StorjVideoStorage(), upload_to='usersvideo/web'),
+        ),
+        migrations.AddField(
+            model_name='challengeuseranswer',
+            name='processing_error',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='challengeuseranswer',
+            name='processing_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='challengeuseranswer',
+            name='video_codec',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
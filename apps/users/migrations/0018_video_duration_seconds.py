@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:01
+
+import utils.supabase_storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_challengeuseranswer_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='duration_seconds',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='duration',
+            field=models.CharField(blank=True, help_text='Filled from the video file when empty', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='poster_url',
+            field=models.ImageField(blank=True, help_text='Leave empty to use a frame from the video', storage=utils.supabase_storage.SupabaseStorage(bucket_name='posters'), upload_to='posters/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_video_duration_seconds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='hls_manifest',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_opening_balances(apps, schema_editor):
+    # текущий баланс становится первой записью журнала, чтобы сумма сходилась с points_count
+    User = apps.get_model('users', 'User')
+    PointsTransaction = apps.get_model('users', 'PointsTransaction')
+
+    PointsTransaction.objects.bulk_create(
+        [
+            PointsTransaction(user_id=user_id, amount=points, reason='opening', key='opening')
+            for user_id, points in User.objects.exclude(points_count=0).values_list('pk', 'points_count')
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_video_hls_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField()),
+                ('reason', models.CharField(choices=[('opening', 'Opening balance'), ('video', 'Video'), ('funfact', 'Fun fact'), ('chitchat', 'Chit chat'), ('quiz', 'Quiz'), ('challenge', 'Challenge'), ('invite', 'Invitation'), ('reward', 'Reward')], max_length=20)),
+                ('key', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'key'), name='unique_points_transaction_key')],
+            },
+        ),
+        migrations.RunPython(create_opening_balances, migrations.RunPython.noop),
+    ]
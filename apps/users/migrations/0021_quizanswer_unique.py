@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:09
+
+from django.db import migrations
+from django.db.models import Max
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    # из повторных отправок оставляем последний ответ на вопрос
+    QuizAnswer = apps.get_model('users', 'QuizAnswer')
+
+    keep_ids = QuizAnswer.objects.values('quiz_user_choice', 'question').annotate(last_id=Max('id')).values('last_id')
+    QuizAnswer.objects.exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_pointstransaction'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='quizanswer',
+            unique_together={('quiz_user_choice', 'question')},
+        ),
+    ]
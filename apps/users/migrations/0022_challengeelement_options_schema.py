@@ -0,0 +1,59 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:14
+
+import re
+
+from django.db import migrations, models
+
+# копия apps.users.challenge_display на момент миграции: результат не должен
+# зависеть от будущих правок кода приложения
+OPTION_RE = re.compile(r"^(.*?)\s*(\(#([^)]*)\))?$")
+
+
+def normalize_label(label):
+    return re.sub(r"\s+", "", label).lower()
+
+
+def compile_options(value_string):
+    if not value_string:
+        return []
+    schema = []
+    for raw in value_string.split(","):
+        raw = raw.strip()
+        match = OPTION_RE.match(raw)
+        if match:
+            label = match.group(1).strip()
+            color = f"#{match.group(3)}" if match.group(3) else None
+        else:
+            label, color = raw, None
+        schema.append({
+            'value': raw,
+            'label': label,
+            'color': color,
+            'key': normalize_label(label),
+        })
+    return schema
+
+
+def compile_element_options(apps, schema_editor):
+    ChallengeElement = apps.get_model('users', 'ChallengeElement')
+
+    elements = list(ChallengeElement.objects.only('id', 'value'))
+    for element in elements:
+        element.options_schema = compile_options(element.value)
+    ChallengeElement.objects.bulk_update(elements, ['options_schema'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0021_quizanswer_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challengeelement',
+            name='options_schema',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Compiled options'),
+        ),
+        migrations.RunPython(compile_element_options, migrations.RunPython.noop),
+    ]
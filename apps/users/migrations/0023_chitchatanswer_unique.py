@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:17
+
+from django.db import migrations
+from django.db.models import Max
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    # из повторов оставляем последний ответ на пару
+    ChitChatAnswer = apps.get_model('users', 'ChitChatAnswer')
+
+    keep_ids = ChitChatAnswer.objects.values('user_choice', 'option_pair').annotate(last_id=Max('id')).values('last_id')
+    ChitChatAnswer.objects.exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0022_challengeelement_options_schema'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='chitchatanswer',
+            unique_together={('user_choice', 'option_pair')},
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:18
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+
+
+def count_answers(apps, schema_editor):
+    ChitChatOption = apps.get_model('users', 'ChitChatOption')
+
+    options = list(ChitChatOption.objects.annotate(
+        actual_1=Count('chitchatanswer', filter=Q(chitchatanswer__answer=F('option_1'))),
+        actual_2=Count('chitchatanswer', filter=Q(chitchatanswer__answer=F('option_2')) & ~Q(option_2=F('option_1'))),
+    ))
+    for option in options:
+        option.option_1_count, option.option_2_count = option.actual_1, option.actual_2
+    ChitChatOption.objects.bulk_update(options, ['option_1_count', 'option_2_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0023_chitchatanswer_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chitchatoption',
+            name='option_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Option 1 answers'),
+        ),
+        migrations.AddField(
+            model_name='chitchatoption',
+            name='option_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Option 2 answers'),
+        ),
+        migrations.RunPython(count_answers, migrations.RunPython.noop),
+    ]
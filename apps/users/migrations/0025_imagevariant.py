@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def map_existing_variants(apps, schema_editor):
+    ImageAsset = apps.get_model('users', 'ImageAsset')
+    ImageVariant = apps.get_model('users', 'ImageVariant')
+
+    # уже сохранённые блобы вариантов; пропущенные дубли дозаполнит generate_image_variants
+    variants = ImageAsset.objects.filter(source__isnull=False).exclude(variant='').values_list(
+        'source_id', 'variant', 'mime_type', 'sha256'
+    )
+    ImageVariant.objects.bulk_create(
+        [
+            ImageVariant(source_id=source_id, name=name, mime_type=mime_type, asset_id=sha256)
+            for source_id, name, mime_type, sha256 in variants.iterator()
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0024_chitchatoption_tallies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20)),
+                ('mime_type', models.CharField(max_length=50)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.imageasset', to_field='sha256')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='users.imageasset', to_field='sha256')),
+            ],
+            options={
+                'verbose_name': 'Image variant',
+                'verbose_name_plural': 'Image variants',
+                'unique_together': {('source', 'name', 'mime_type')},
+            },
+        ),
+        migrations.RunPython(map_existing_variants, migrations.RunPython.noop),
+    ]
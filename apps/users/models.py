@@ -2,22 +2,229 @@ import os
 import re
 import mimetypes
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
-import base64
+import hashlib
 from io import BytesIO
 from PIL import Image
+from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.text import slugify
 
 from apps.users.storage_backends import StorjVideoStorage
 from utils.supabase_storage import SupabaseStorage
+from . import video_processing
+from .challenge_display import compile_options
+from .content_resolver import get_content_object
 from django.utils.safestring import mark_safe
 
 
+# Ширина вариантов изображений: карточки в сетке, полноэкранный просмотр, превью в админке
+IMAGE_VARIANT_WIDTHS = {
+    'card': 480,
+    'detail': 1080,
+    'admin': 300,
+}
+
+# Максимальная сторона аватара пользователя
+AVATAR_SIZE = 256
+
+# Форматы в порядке предпочтения и их параметры сохранения
+IMAGE_VARIANT_FORMATS = [
+    ('image/avif', 'AVIF', {'quality': 60}),
+    ('image/webp', 'WEBP', {'quality': 80, 'method': 6}),
+    ('image/jpeg', 'JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+]
+
+
+def supported_variant_formats():
+    """
+    Форматы, которые умеет сохранять установленный Pillow (AVIF/WebP зависят от сборки).
+    """
+    Image.init()
+    return [fmt for fmt in IMAGE_VARIANT_FORMATS if fmt[1] in Image.SAVE]
+
+
+def flatten_image(img):
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def render_jpeg(image_file, quality=85):
+    """
+    Открывает изображение, убирает альфа-канал и возвращает JPEG в байтах.
+    """
+    img = flatten_image(Image.open(image_file))
+
+    buffered = BytesIO()
+    img.save(buffered, format="JPEG", quality=quality)
+    return buffered.getvalue()
+
+
+def image_asset_url(sha256, variant=None):
+    if not sha256:
+        return None
+    if variant:
+        return reverse('image_variant', args=[sha256, variant])
+    return reverse('image_asset', args=[sha256])
+
+
+class ImageAsset(models.Model):
+    """
+    Готовое изображение, адресуемое по sha256 содержимого.
+    Горячие модели хранят только ссылку (sha256), байты отдаются по URL с долгим кэшем.
+    Блобы вариантов (card/detail/admin) хранятся здесь же со ссылкой на source,
+    а какой блоб отдавать для варианта — в ImageVariant.
+    """
+    sha256 = models.CharField(max_length=64, unique=True, editable=False)
+    mime_type = models.CharField(max_length=50, default='image/jpeg')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    source = models.ForeignKey(
+        'self',
+        to_field='sha256',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='variants'
+    )
+    variant = models.CharField(max_length=20, blank=True, default='')
+
+    class Meta:
+        verbose_name = "Image asset"
+        verbose_name_plural = "Image assets"
+        indexes = [
+            models.Index(fields=['source', 'variant']),
+        ]
+
+    def __str__(self):
+        if self.variant:
+            return f"{self.sha256[:12]} {self.variant} {self.mime_type} ({self.width}x{self.height})"
+        return f"{self.sha256[:12]} ({self.width}x{self.height})"
+
+    @property
+    def url(self):
+        return image_asset_url(self.sha256)
+
+    @classmethod
+    def from_bytes(cls, data, mime_type='image/jpeg', source=None, variant=''):
+        sha256 = hashlib.sha256(data).hexdigest()
+        asset = cls.objects.filter(sha256=sha256).only('pk', 'sha256').first()
+        if asset:
+            return asset
+
+        width = height = None
+        try:
+            width, height = Image.open(BytesIO(data)).size
+        except Exception:
+            pass
+
+        asset, _ = cls.objects.get_or_create(
+            sha256=sha256,
+            defaults={
+                'mime_type': mime_type,
+                'width': width,
+                'height': height,
+                'data': data,
+                'source': source,
+                'variant': variant,
+            },
+        )
+        return asset
+
+    @classmethod
+    def from_image_file(cls, image_file):
+        return cls.from_bytes(render_jpeg(image_file))
+
+    def generate_variants(self):
+        """
+        Создаёт недостающие варианты для каждой ширины и поддерживаемого формата.
+        Изображение не увеличивается: если исходник уже не шире варианта, в его
+        JPEG-слот записывается сам исходник. Одинаковые рендеры кодируются один раз.
+        """
+        existing = set(self.renditions.values_list('name', 'mime_type'))
+        img = flatten_image(Image.open(BytesIO(bytes(self.data))))
+        encoded = {}
+        created = []
+
+        for name, width in IMAGE_VARIANT_WIDTHS.items():
+            resized = img
+            if img.width > width:
+                height = max(1, round(img.height * width / img.width))
+                resized = img.resize((width, height), Image.LANCZOS)
+
+            for mime_type, pil_format, save_kwargs in supported_variant_formats():
+                if (name, mime_type) in existing:
+                    continue
+
+                if resized is img and mime_type == self.mime_type:
+                    asset = self
+                elif (resized.size, mime_type) in encoded:
+                    asset = encoded[(resized.size, mime_type)]
+                else:
+                    buffered = BytesIO()
+                    resized.save(buffered, format=pil_format, **save_kwargs)
+                    asset = ImageAsset.from_bytes(
+                        buffered.getvalue(),
+                        mime_type=mime_type,
+                        source=self,
+                        variant=name,
+                    )
+                    encoded[(resized.size, mime_type)] = asset
+
+                rendition, was_created = ImageVariant.objects.get_or_create(
+                    source=self,
+                    name=name,
+                    mime_type=mime_type,
+                    defaults={'asset': asset},
+                )
+                if was_created:
+                    created.append(rendition)
+
+        return created
+
+
+class ImageVariant(models.Model):
+    """
+    Какой блоб отдавать для (исходник, вариант, формат). Блобы адресуются по
+    содержимому, и одинаковые рендеры разных вариантов (или сам исходник)
+    хранятся одной строкой ImageAsset, поэтому соответствие живёт отдельно.
+    """
+    source = models.ForeignKey(
+        ImageAsset,
+        to_field='sha256',
+        on_delete=models.CASCADE,
+        related_name='renditions'
+    )
+    name = models.CharField(max_length=20)
+    mime_type = models.CharField(max_length=50)
+    asset = models.ForeignKey(
+        ImageAsset,
+        to_field='sha256',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    class Meta:
+        verbose_name = "Image variant"
+        verbose_name_plural = "Image variants"
+        unique_together = ('source', 'name', 'mime_type')
+
+    def __str__(self):
+        return f"{self.source_id[:12]} {self.name} {self.mime_type}"
+
+
 class User(AbstractUser):
     username = models.CharField(max_length=150, unique=True, blank=True)
     email = models.EmailField(unique=True)
@@ -44,25 +251,57 @@ class User(AbstractUser):
         related_name='completed_by'
     )
 
-    def get_profile_picture_base64(self):
-        try:
-            if not self.profile_picture:
-                return None
+    avatar_asset = models.ForeignKey(
+        ImageAsset,
+        to_field='sha256',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+'
+    )
 
-            img = Image.open(self.profile_picture)
+    def save(self, *args, **kwargs):
+        # При смене фото сбрасываем готовый аватар и пересчитываем его в фоне
+        picture_changed = False
+        update_fields = kwargs.get('update_fields')
+        if self.pk is None:
+            picture_changed = bool(self.profile_picture)
+        elif update_fields is None or 'profile_picture' in update_fields:
+            # частичные save без фото (update_last_login и т.п.) сверять не нужно
+            old_name = User.objects.filter(pk=self.pk).values_list('profile_picture', flat=True).first()
+            picture_changed = (old_name or '') != (self.profile_picture.name or '')
+
+        if picture_changed:
+            self.avatar_asset = None
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'avatar_asset'}
 
-            if img.mode in ('RGBA', 'LA'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[-1])
-                img = background
+        super().save(*args, **kwargs)
 
-            buffered = BytesIO()
-            img.save(buffered, format="JPEG", quality=85)
-            return base64.b64encode(buffered.getvalue()).decode('utf-8')
+        if picture_changed and self.profile_picture:
+            from .tasks import render_user_avatar
+            name = self.profile_picture.name
+            transaction.on_commit(lambda: render_user_avatar.delay(self.pk, name))
 
-        except Exception as e:
-            print(f"Error converting profile picture to Base64: {e}")
-            return None
+    def render_avatar(self):
+        """
+        Скачивает profile_picture один раз и сохраняет уменьшенный JPEG как ImageAsset.
+        """
+        img = flatten_image(Image.open(self.profile_picture))
+        img.thumbnail((AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+
+        buffered = BytesIO()
+        img.save(buffered, format="JPEG", quality=85)
+        return ImageAsset.from_bytes(buffered.getvalue(), variant='avatar')
+
+    @property
+    def avatar_url(self):
+        if self.avatar_asset_id:
+            return image_asset_url(self.avatar_asset_id)
+        if self.profile_picture:
+            return self.profile_picture.url
+        return None
 
     def __str__(self):
         return self.username
@@ -86,6 +325,37 @@ class UserReward(models.Model):
     def __str__(self):
         return f"{self.user.username} — {self.reward.title}"
 
+class PointsTransaction(models.Model):
+    """
+    Журнал начислений и списаний баллов. Баланс хранится в User.points_count,
+    key не даёт начислить одно и то же дважды (например 'video:12').
+    """
+    REASON_CHOICES = [
+        ('opening', 'Opening balance'),
+        ('video', 'Video'),
+        ('funfact', 'Fun fact'),
+        ('chitchat', 'Chit chat'),
+        ('quiz', 'Quiz'),
+        ('challenge', 'Challenge'),
+        ('invite', 'Invitation'),
+        ('reward', 'Reward'),
+    ]
+
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='points_transactions')
+    amount = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    key = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_points_transaction_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.amount:+d} ({self.key})"
+
+
 class Schools(models.Model):
     name = models.CharField(max_length=70)
     code = models.IntegerField(blank=True, null=True)
@@ -115,6 +385,32 @@ class UserSchool(models.Model):
 
 
 
+def compute_availability(rows, completed_ids):
+    """
+    rows — (pk, order, always_available), отсортированные по order.
+    Элемент доступен, если он первый, помечен always_available
+    или все предыдущие (с меньшим order) обязательные элементы пройдены.
+    """
+    availability = {}
+    blocked = False
+    group_blocked = False
+    current_order = None
+
+    for index, (pk, order, always_available) in enumerate(rows):
+        # элементы с одинаковым order не блокируют друг друга
+        if order != current_order:
+            blocked = blocked or group_blocked
+            group_blocked = False
+            current_order = order
+
+        availability[pk] = always_available or index == 0 or not blocked
+
+        if not always_available and pk not in completed_ids:
+            group_blocked = True
+
+    return availability
+
+
 class Page(models.Model):
     title = models.CharField(max_length=255)
     subtitle = models.CharField(max_length=255, blank=True)
@@ -155,6 +451,28 @@ class Page(models.Model):
     def __str__(self):
         return self.title
 
+    def unlock_rows(self):
+        """
+        (pk, order, always_available) всех элементов страницы в порядке показа.
+        """
+        return list(
+            self.contents.order_by('order').values_list('pk', 'order', 'always_available')
+        )
+
+    def availability_for(self, user, completed_ids=None, rows=None):
+        """
+        Возвращает {content_pk: bool} для всех элементов страницы за один проход.
+        completed_ids — опционально, set с ID пройденного контента
+        rows — опционально, заранее загруженный результат unlock_rows()
+        """
+        if rows is None:
+            rows = self.unlock_rows()
+
+        if completed_ids is None:
+            completed_ids = set(user.completed_content.values_list('pk', flat=True))
+
+        return compute_availability(rows, completed_ids)
+
 
 
 class Content(models.Model):
@@ -189,14 +507,6 @@ class Content(models.Model):
         help_text='If checked, this content is available regardless of order'
     )
 
-    poster_base64 = models.TextField(
-        blank=True,
-        null=True,
-        editable=False,
-        verbose_name='Poster url',
-        help_text='Filled automatically for video content'
-    )
-
     class Meta:
         ordering = ['page', 'order']
         indexes = [
@@ -204,9 +514,11 @@ class Content(models.Model):
         ]
 
     def __str__(self):
-        if self.value:
-            title = getattr(self.value, 'title', None) or str(self.value)
-            return f'{self.value.__class__.__name__} "{title}"'
+        # в списках объекты заранее кладутся в кэш ContentResolver.attach, тогда запроса нет
+        value = get_content_object(self, 'value')
+        if value:
+            title = getattr(value, 'title', None) or str(value)
+            return f'{value.__class__.__name__} "{title}"'
         return f'Content #{self.pk}'
 
     def save(self, *args, **kwargs):
@@ -219,55 +531,18 @@ class Content(models.Model):
             )['order__max'] or 0
             self.order = last_order + 1
 
-        # если контент — видео, сохраняем постер
-        if self.value and isinstance(self.value, Video):
-            self.poster_base64 = getattr(self.value, 'poster_base64', None)
-
         super().save(*args, **kwargs)
 
     def is_available_for_user(self, user, completed_ids=None):
         """
         Проверяет, доступен ли контент пользователю.
         completed_ids — опционально, set с ID пройденного контента (для оптимизации)
+        Для всей страницы сразу используйте Page.availability_for().
         """
-        # Правило 1: всегда доступен по флагу
         if self.always_available:
             return True
 
-        # Получаем все контенты на этой странице, отсортированные по order
-        page_contents = Content.objects.filter(
-            page=self.page
-        ).order_by('order')
-
-        # Если это первый элемент — доступен
-        first_content = page_contents.first()
-        if first_content and self.pk == first_content.pk:
-            return True
-
-        # Если не передали completed_ids — загружаем
-        if completed_ids is None:
-            completed_ids = set(user.completed_content.values_list('pk', flat=True))
-
-        # Правило 3: проверяем, все ли предыдущие элементы пройдены
-        for prev in page_contents:
-            if prev.order >= self.order:
-                break  # Достигли текущего элемента
-
-            # Пропускаем элементы, которые всегда доступны
-            if prev.always_available:
-                continue
-
-            # Если предыдущий элемент НЕ пройден — текущий заблокирован
-            if prev.pk not in completed_ids:
-                return False
-
-        return True
-
-    @property
-    def poster_base64_display(self):
-        if self.poster_base64:
-            return f"data:image/jpeg;base64,{self.poster_base64}"
-        return None
+        return self.page.availability_for(user, completed_ids=completed_ids).get(self.pk, False)
 
     class Meta:
         indexes = [
@@ -283,10 +558,24 @@ class Video(models.Model):
     filename = models.CharField(max_length=200)
     poster_url = models.ImageField(
         upload_to='posters/',
-        storage=SupabaseStorage(bucket_name='posters')
+        storage=SupabaseStorage(bucket_name='posters'),
+        blank=True,
+        help_text="Leave empty to use a frame from the video"
     )
-    poster_base64 = models.TextField(blank=True, null=True)
-    duration = models.CharField(max_length=20)
+    poster_asset = models.ForeignKey(
+        ImageAsset,
+        to_field='sha256',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+'
+    )
+    duration = models.CharField(max_length=20, blank=True, help_text="Filled from the video file when empty")
+    # Заполняется задачей ingest_video, по нему и сортируем
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # master.m3u8 в бакете video_file, пишется задачей package_video_hls
+    hls_manifest = models.CharField(max_length=255, blank=True, editable=False)
     points = models.PositiveIntegerField(default=50)
 
     def __str__(self):
@@ -302,10 +591,6 @@ class Video(models.Model):
             errors['video_file'] = 'Video file is required'
         if self.points is None:
             errors['points'] = 'Points are required'
-        if not self.duration:
-            errors['duration'] = 'Duration is required'
-        if not self.poster_url:
-            self.poster_base64 = None
 
         if errors:
             raise ValidationError(errors)
@@ -322,39 +607,70 @@ class Video(models.Model):
         if self.video_file and hasattr(self.video_file, 'url'):
             self.video_url = self.video_file.url
 
-        if self.pk:
-            old_video = Video.objects.get(pk=self.pk)
-            if old_video.poster_url != self.poster_url or not self.poster_base64:
-                self.convert_poster_to_base64()
-        else:
-            if self.poster_url:
-                self.convert_poster_to_base64()
+        # Длительность и постер считает фоновая задача ingest_video
+        old_video = Video.objects.filter(pk=self.pk).values('video_file', 'poster_url').first() if self.pk else None
+        video_changed = not old_video or old_video['video_file'] != self.video_file.name
+        poster_changed = not old_video or (old_video['poster_url'] or '') != (self.poster_url.name or '')
+
+        if video_changed:
+            self.duration_seconds = None
+            self.hls_manifest = ''
+        if poster_changed:
+            self.poster_asset = None
 
         super().save(*args, **kwargs)
 
-    def convert_poster_to_base64(self):
+        if video_changed or poster_changed or not self.poster_asset_id:
+            from .tasks import ingest_video
+            transaction.on_commit(lambda: ingest_video.delay(self.pk))
+        if video_changed and self.video_file:
+            from .tasks import package_video_hls
+            transaction.on_commit(lambda: package_video_hls.delay(self.pk))
+
+    def render_poster(self, video_path=None):
+        """
+        Постер из загруженной картинки, а если её нет — кадр из видео.
+        """
         try:
-            if not self.poster_url:
-                self.poster_base64 = None
-                return
+            if self.poster_url:
+                return ImageAsset.from_image_file(self.poster_url)
+            if video_path:
+                return ImageAsset.from_bytes(video_processing.extract_poster(video_path, self.duration_seconds))
+        except Exception as e:
+            print(f"Error rendering poster image: {e}")
+        return None
 
-            img = Image.open(self.poster_url)
+    @staticmethod
+    def format_duration(seconds):
+        minutes, seconds = divmod(int(seconds), 60)
+        return f"{minutes}:{seconds:02d}"
 
-            if img.mode in ('RGBA', 'LA'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[-1])
-                img = background
+    @property
+    def poster_image_url(self):
+        return image_asset_url(self.poster_asset_id)
 
-            buffered = BytesIO()
-            img.save(buffered, format="JPEG", quality=85)
-            self.poster_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+    @property
+    def poster_card_url(self):
+        return image_asset_url(self.poster_asset_id, 'card')
 
-        except Exception as e:
-            print(f"Error converting poster image to Base64: {e}")
-            self.poster_base64 = None
+    @property
+    def poster_admin_url(self):
+        return image_asset_url(self.poster_asset_id, 'admin')
+
+    @property
+    def stream_url(self):
+        if not self.video_file:
+            return None
+        return reverse('video_stream', args=[self.pk, self.video_file.name])
+
+    @property
+    def hls_url(self):
+        if not self.hls_manifest:
+            return None
+        return self.video_file.storage.url(self.hls_manifest)
 
     def get_storj_url(self):
-        return f"https://link.storjshare.io/s/jx3blensqenp6hmoiz444ldnnrxq/videobucket/{self.filename}?wrap=0"
+        return self.stream_url
 
 
 class FunFact(models.Model):
@@ -368,16 +684,36 @@ class FunFact(models.Model):
     )
     duration = models.CharField(max_length=20, blank=True, null=True)
 
-    photo_base64 = models.TextField(blank=True, null=True)
+    photo_asset = models.ForeignKey(
+        ImageAsset,
+        to_field='sha256',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+'
+    )
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if self.photo and not self.photo_base64:
-            self.convert_image_to_base64()
+        if self.photo and not self.photo_asset_id:
+            self.render_photo()
         super().save(*args, **kwargs)
 
+    @property
+    def photo_image_url(self):
+        return image_asset_url(self.photo_asset_id)
+
+    @property
+    def photo_detail_url(self):
+        return image_asset_url(self.photo_asset_id, 'detail')
+
+    @property
+    def photo_admin_url(self):
+        return image_asset_url(self.photo_asset_id, 'admin')
+
     @property
     def formatted_description(self):
         text = self.fact_description
@@ -387,23 +723,13 @@ class FunFact(models.Model):
         text = re.sub(r'_(.*?)_', r'<em>\1</em>', text)
         return mark_safe(text)
 
-    def convert_image_to_base64(self):
+    def render_photo(self):
         try:
-            img = Image.open(self.photo)
-
-            if img.mode in ('RGBA', 'LA'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[-1])
-                img = background
-
-            buffered = BytesIO()
-            img.save(buffered, format="JPEG", quality=85)
-
-            self.photo_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+            self.photo_asset = ImageAsset.from_image_file(self.photo)
 
         except Exception as e:
-            print(f"Error converting image to Base64: {e}")
-            self.photo_base64 = None
+            print(f"Error rendering fun fact image: {e}")
+            self.photo_asset = None
 
 
 class ChitChat(models.Model):
@@ -440,9 +766,25 @@ class ChitChatOption(models.Model):
         verbose_name="Option 2"
     )
 
+    # Счётчики ответов, обновляются при сохранении ответов и сверяются задачей reconcile_chitchat_tallies
+    option_1_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Option 1 answers")
+    option_2_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Option 2 answers")
+
     def has_options(self):
         return bool(self.option_1 or self.option_2)
 
+    @property
+    def answers_count(self):
+        return self.option_1_count + self.option_2_count
+
+    @property
+    def option_1_percent(self):
+        return round(self.option_1_count * 100 / self.answers_count) if self.answers_count else 0
+
+    @property
+    def option_2_percent(self):
+        return 100 - self.option_1_percent if self.answers_count else 0
+
     class Meta:
         verbose_name = "Options Table"
         verbose_name_plural = "Options Tables"
@@ -494,6 +836,7 @@ class ChitChatAnswer(models.Model):
     class Meta:
         verbose_name = "Chit Chat | Single Answer"
         verbose_name_plural = "Chit Chat | Single Answers"
+        unique_together = ('user_choice', 'option_pair')
 
     def __str__(self):
         return f"{self.user_choice.user.username}: {self.answer}"
@@ -506,7 +849,15 @@ class Challenge(models.Model):
     points = models.IntegerField(verbose_name="Points", default=100)
     button_add_name = models.CharField(max_length=50, verbose_name="Button add name")
     button_view_name = models.CharField(max_length=50, verbose_name="Button view name")
-    picture_base64 = models.TextField(blank=True, null=True)
+    picture_asset = models.ForeignKey(
+        ImageAsset,
+        to_field='sha256',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+'
+    )
     min_answers_required = models.PositiveIntegerField(default=1, verbose_name="Minimum number of answers required")
     duration = models.CharField(max_length=20, blank=True, null=True)
 
@@ -517,12 +868,24 @@ class Challenge(models.Model):
         if self.pk:
             old_obj = Challenge.objects.filter(pk=self.pk).first()
             if old_obj and old_obj.picture != self.picture:
-                self.convert_image_to_base64()
+                self.render_picture()
         elif self.picture:
-            self.convert_image_to_base64()
+            self.render_picture()
 
         super().save(*args, **kwargs)
 
+    @property
+    def picture_image_url(self):
+        return image_asset_url(self.picture_asset_id)
+
+    @property
+    def picture_detail_url(self):
+        return image_asset_url(self.picture_asset_id, 'detail')
+
+    @property
+    def picture_admin_url(self):
+        return image_asset_url(self.picture_asset_id, 'admin')
+
     @property
     def formatted_description(self):
         text = self.instructions
@@ -531,30 +894,21 @@ class Challenge(models.Model):
         text = re.sub(r'_(.*?)_', r'<em>\1</em>', text)
         return mark_safe(text)
 
-    def convert_image_to_base64(self):
+    def render_picture(self):
         mime_type, encoding = mimetypes.guess_type(self.picture.name)
         self.picture_mime_type = mime_type
 
         if mime_type == 'image/svg+xml':
-            self.picture_base64 = None  # не конвертируем SVG
+            self.picture_asset = None  # не конвертируем SVG
             return
 
         try:
             self.picture.seek(0)  # на всякий случай
-            img = Image.open(self.picture)
-
-            if img.mode in ('RGBA', 'LA'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[-1])
-                img = background
-
-            buffered = BytesIO()
-            img.save(buffered, format="JPEG", quality=85)
-            self.picture_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+            self.picture_asset = ImageAsset.from_image_file(self.picture)
 
         except Exception as e:
-            print(f"Error converting Challenge image to Base64: {e}")
-            self.picture_base64 = None
+            print(f"Error rendering Challenge image: {e}")
+            self.picture_asset = None
 
 
 class ChallengeElement(models.Model):
@@ -583,14 +937,37 @@ class ChallengeElement(models.Model):
     add_other_option = models.BooleanField(default=False, verbose_name='Add variant "Other"')
     show_after_confirm = models.BooleanField(default=False, verbose_name="Show after condition is done")
 
+    # Разобранный value: [{'value', 'label', 'color', 'key'}], пересобирается в save()
+    options_schema = models.JSONField(default=list, blank=True, editable=False, verbose_name="Compiled options")
+
     class Meta:
         ordering = ['order']
 
     def __str__(self):
         return f"{self.name} ({self.element})"
 
+    def save(self, *args, **kwargs):
+        self.options_schema = compile_options(self.value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'value' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'options_schema'}
+        super().save(*args, **kwargs)
+
+    @property
+    def parsed_options(self):
+        """Варианты с метками и цветами ({'label', 'color', ...}) без разбора строки."""
+        return self.options_schema
+
+    @property
+    def color_map(self):
+        # {нормализованная метка: цвет}; при повторе метки побеждает первый вариант
+        colors = {}
+        for option in self.options_schema:
+            colors.setdefault(option['key'], option['color'])
+        return colors
+
     def get_options(self):
-        options = [opt.strip() for opt in self.value.split(",")] if self.value else []
+        options = [option['value'] for option in self.options_schema]
         if self.element in ["radio", "checkbox"] and self.add_other_option:
             options.append("Other")
         return options
@@ -661,16 +1038,74 @@ class ChallengeUserAttempt(models.Model):
         return f"Attempt at {self.submitted_at:%Y-%m-%d %H:%M}"
 
 class ChallengeUserAnswer(models.Model):
+    PROCESSING_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     attempt = models.ForeignKey(ChallengeUserAttempt, on_delete=models.CASCADE, related_name='answers')
     element = models.ForeignKey('ChallengeElement', on_delete=models.CASCADE)
     answer = models.TextField()
     file = models.FileField(storage=StorjVideoStorage(), upload_to='usersvideo')
 
+    # Заполняются задачей process_uploaded_file
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_CHOICES, blank=True, editable=False)
+    processing_error = models.TextField(blank=True, editable=False)
+    processed_file = models.FileField(storage=StorjVideoStorage(), upload_to='usersvideo/web', blank=True, editable=False)
+    duration_seconds = models.FloatField(null=True, blank=True, editable=False)
+    video_codec = models.CharField(max_length=32, blank=True, editable=False)
+    poster_asset = models.ForeignKey(
+        ImageAsset,
+        to_field='sha256',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+'
+    )
+
     def __str__(self):
         if self.file:
             return f"{self.element.name} → {self.file.name}"
         return f"{self.element.name} → {self.answer}"
 
+    def save(self, *args, **kwargs):
+        # Новый файл — старые результаты обработки больше не подходят
+        if self.pk:
+            old_name = ChallengeUserAnswer.objects.filter(pk=self.pk).values_list('file', flat=True).first()
+            file_changed = (old_name or '') != (self.file.name or '')
+        else:
+            file_changed = bool(self.file)
+
+        if file_changed:
+            self.reset_processing()
+
+        super().save(*args, **kwargs)
+
+    def reset_processing(self):
+        self.processing_status = 'pending' if self.file else ''
+        self.processing_error = ''
+        self.processed_file = None
+        self.duration_seconds = None
+        self.video_codec = ''
+        self.poster_asset = None
+
+    @property
+    def playback_url(self):
+        if self.processing_status == 'ready' and self.processed_file:
+            return reverse('answer_stream', args=[self.pk, self.processed_file.name])
+        return self.file_url
+
+    @property
+    def file_url(self):
+        return reverse('answer_stream', args=[self.pk, self.file.name]) if self.file else None
+
+    @property
+    def poster_image_url(self):
+        return image_asset_url(self.poster_asset_id, 'card') if self.poster_asset_id else None
+
 
 
 
@@ -680,6 +1115,10 @@ class Quiz(models.Model):
     title = models.CharField(max_length=150)
     duration = models.CharField(max_length=20, blank=True, null=True)
 
+    # Поддерживаются сигналами QuizQuestion (см. signals.py)
+    points_total = models.PositiveIntegerField(default=0, editable=False, verbose_name="Total points")
+    questions_total = models.PositiveIntegerField(default=0, editable=False, verbose_name="Questions count")
+
     class Meta:
         verbose_name = "Quizzes"
         verbose_name_plural = "Quizzes"
@@ -688,10 +1127,21 @@ class Quiz(models.Model):
         return self.title
 
     def total_points(self):
-        return self.questions.aggregate(total=models.Sum('points'))['total'] or 0
+        return self.points_total
 
     def questions_count(self):
-        return self.questions.count()
+        return self.questions_total
+
+    @classmethod
+    def refresh_totals(cls, quiz_id):
+        totals = QuizQuestion.objects.filter(quiz_id=quiz_id).aggregate(
+            points=models.Sum('points'),
+            count=models.Count('pk'),
+        )
+        cls.objects.filter(pk=quiz_id).update(
+            points_total=totals['points'] or 0,
+            questions_total=totals['count'],
+        )
 
 QUESTION_TYPE_CHOICES = [
     ('input', 'Input'),
@@ -758,6 +1208,9 @@ class QuizAnswer(models.Model):
     user_answer = models.TextField(default=' ')
     is_correct = models.BooleanField(default=False)
 
+    class Meta:
+        unique_together = ('quiz_user_choice', 'question')
+
     def __str__(self):
         return f"Answer for {self.question.text} by {self.quiz_user_choice.user.username}"
 
@@ -768,25 +1221,10 @@ class Favourites(models.Model):
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey("content_type", "object_id")
     created_at = models.DateTimeField(auto_now_add=True)
-    poster_base64 = models.TextField(
-        blank=True,
-        null=True,
-        editable=False,
-        verbose_name="Poster Base64"
-    )
 
     class Meta:
         unique_together = ('user', 'content_type', 'object_id')
 
-    def save(self, *args, **kwargs):
-        # Если объект — видео, берём Base64 постер
-        if isinstance(self.content_object, Video) and getattr(self.content_object, 'poster_base64', None):
-            self.poster_base64 = self.content_object.poster_base64
-        else:
-            self.poster_base64 = None
-
-        super().save(*args, **kwargs)
-
 
 class Rewards(models.Model):
     title = models.CharField(max_length=50)
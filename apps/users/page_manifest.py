@@ -0,0 +1,103 @@
+# apps/users/page_manifest.py
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .content_resolver import ContentResolver
+from .models import Page, Content
+
+MANIFEST_VERSION_KEY = 'page_manifest:version'
+MANIFEST_TIMEOUT = 60 * 60 * 24
+# без REDIS_URL кэш свой у каждого процесса: сброс версии видит только текущий,
+# поэтому остальные держат закэшированное не дольше минуты
+LOCAL_CACHE_TIMEOUT = 60
+
+CONTENT_MODELS = ['video', 'funfact', 'challenge', 'chitchat', 'quiz']
+
+
+def get_manifest_version():
+    version = cache.get(MANIFEST_VERSION_KEY)
+    if version is None:
+        # после очистки кэша начинаем с новой метки, чтобы не поднять старые манифесты
+        cache.add(MANIFEST_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(MANIFEST_VERSION_KEY)
+    return version
+
+
+def bump_manifest_version():
+    try:
+        cache.incr(MANIFEST_VERSION_KEY)
+    except ValueError:
+        cache.set(MANIFEST_VERSION_KEY, time.time_ns(), None)
+
+
+def get_cache_timeout(timeout):
+    """timeout для общего кэша или LOCAL_CACHE_TIMEOUT, если кэш у процесса свой."""
+    if isinstance(caches['default'], LocMemCache):
+        return LOCAL_CACHE_TIMEOUT
+    return timeout
+
+
+def get_manifest_timeout():
+    return get_cache_timeout(MANIFEST_TIMEOUT)
+
+
+def build_page_manifest(page):
+    """
+    Общая для всех пользователей часть страницы: упорядоченный контент
+    с уже загруженными объектами, длительностью, баллами и постерами.
+    """
+    content_types = ContentType.objects.filter(model__in=CONTENT_MODELS)
+
+    contents = list(Content.objects.filter(
+        content_type__in=content_types,
+        page=page
+    ).select_related('content_type').order_by('order'))
+
+    # объекты всех типов — по одному in_bulk на тип, сразу в кэш content.value
+    ContentResolver().attach(contents, 'value')
+
+    filtered_contents = []
+
+    for content in contents:
+        obj = content.value
+        if content.content_type.model == 'quiz' and obj and obj.title:
+            content.quiz = obj
+
+        if not obj or not getattr(obj, 'title', None):
+            continue
+
+        content.obj = obj
+        content.duration = getattr(obj, 'duration', None)
+        content.points = getattr(obj, 'points', None)
+        if content.content_type.model == 'quiz':
+            content.points = obj.total_points()
+
+        filtered_contents.append(content)
+
+    return {
+        'page': page,
+        'contents': filtered_contents,
+        'unlock_rows': page.unlock_rows(),
+    }
+
+
+def get_page_manifest(slug):
+    """
+    Манифест активной страницы из кэша или None, если страницы нет.
+    Сбрасывается сигналами при изменении страниц и контента (см. signals.py).
+    """
+    key = f'page_manifest:{get_manifest_version()}:{slug}'
+    manifest = cache.get(key)
+    if manifest is not None:
+        return manifest
+
+    page = Page.objects.filter(slug=slug, is_active=True).first()
+    if page is None:
+        return None
+
+    manifest = build_page_manifest(page)
+    cache.set(key, manifest, get_manifest_timeout())
+    return manifest
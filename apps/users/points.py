@@ -0,0 +1,55 @@
+# apps/users/points.py
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import User, PointsTransaction, UserReward
+from .leaderboard import record_points
+
+
+def content_key(obj):
+    """Ключ идемпотентности для начисления за контент: 'video:12', 'quiz:3'."""
+    return f"{obj._meta.model_name}:{obj.pk}"
+
+
+def award_points(user, amount, key, reason):
+    """
+    Начисляет баллы один раз на (user, key). Возвращает начисленное
+    количество или 0, если такое начисление уже было.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                PointsTransaction.objects.create(user=user, amount=amount, reason=reason, key=key)
+        except IntegrityError:
+            return 0
+
+        User.objects.filter(pk=user.pk).update(points_count=F('points_count') + amount)
+        transaction.on_commit(lambda: record_points(user.pk, amount, key))
+
+    user.refresh_from_db(fields=['points_count'])
+    return amount
+
+
+def redeem(user, reward):
+    """
+    Списывает баллы за награду условным UPDATE: баланс не уйдёт в минус
+    даже при одновременных запросах. Возвращает UserReward или None.
+    """
+    with transaction.atomic():
+        updated = User.objects.filter(pk=user.pk, points_count__gte=reward.points_needed).update(
+            points_count=F('points_count') - reward.points_needed
+        )
+        if not updated:
+            return None
+
+        user_reward = UserReward.objects.create(user=user, reward=reward, points_spent=reward.points_needed)
+        PointsTransaction.objects.create(
+            user=user,
+            amount=-reward.points_needed,
+            reason='reward',
+            key=f"reward:{user_reward.pk}",
+        )
+        transaction.on_commit(lambda: record_points(user.pk, -reward.points_needed, f"reward:{user_reward.pk}"))
+
+    user.refresh_from_db(fields=['points_count'])
+    return user_reward
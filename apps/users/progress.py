@@ -0,0 +1,70 @@
+# apps/users/progress.py
+from django.core.cache import cache
+from django.db.models import CharField, Count, Exists, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Concat
+
+from .models import Content, PointsTransaction, User
+from .page_manifest import CONTENT_MODELS, get_cache_timeout, get_manifest_version
+
+PROGRESS_TIMEOUT = 60 * 60 * 24
+
+
+def progress_cache_key(user_id):
+    # версия манифеста меняется при правке страниц и контента — тогда и итоги другие
+    return f"page_progress:{get_manifest_version()}:{user_id}"
+
+
+def build_page_progress(user):
+    """
+    completed/total/points по всем активным страницам одним GROUP BY запросом.
+    Баллы берутся из журнала начислений по ключу контента ('video:12').
+    """
+    completed = User.completed_content.through.objects.filter(user_id=user.pk, content_id=OuterRef('pk'))
+    earned = PointsTransaction.objects.filter(user_id=user.pk, key=OuterRef('ledger_key')).values('amount')[:1]
+
+    rows = (
+        Content.objects
+        .filter(page__is_active=True, content_type__model__in=CONTENT_MODELS)
+        .annotate(
+            is_completed=Exists(completed),
+            ledger_key=Concat(
+                'content_type__model', Value(':'), Cast('object_id', CharField()),
+                output_field=CharField(),
+            ),
+        )
+        .annotate(earned=Coalesce(Subquery(earned, output_field=IntegerField()), 0))
+        .values('page_id')
+        .annotate(
+            total=Count('pk'),
+            completed=Count('pk', filter=Q(is_completed=True)),
+            points=Sum('earned', filter=Q(is_completed=True)),
+        )
+        .order_by()
+    )
+
+    return {
+        row['page_id']: {
+            'completed': row['completed'],
+            'total': row['total'],
+            'points': row['points'] or 0,
+            'percent': round(row['completed'] * 100 / row['total']) if row['total'] else 0,
+        }
+        for row in rows
+    }
+
+
+def get_page_progress(user):
+    """Прогресс пользователя по страницам {page_id: {...}} из кэша."""
+    if not user.is_authenticated:
+        return {}
+
+    key = progress_cache_key(user.pk)
+    progress = cache.get(key)
+    if progress is None:
+        progress = build_page_progress(user)
+        cache.set(key, progress, get_cache_timeout(PROGRESS_TIMEOUT))
+    return progress
+
+
+def invalidate_page_progress(user_ids):
+    cache.delete_many([progress_cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,76 @@
+# apps/users/quiz_payload.py
+import time
+
+from django.core.cache import cache
+from django.http import Http404
+
+from .models import Quiz
+from .page_manifest import get_cache_timeout
+
+QUIZ_PAYLOAD_TIMEOUT = 60 * 60 * 24
+
+
+def quiz_version_key(quiz_id):
+    return f"quiz_payload:version:{quiz_id}"
+
+
+def get_quiz_version(quiz_id):
+    version = cache.get(quiz_version_key(quiz_id))
+    if version is None:
+        # как у манифестов страниц: после очистки кэша — новая метка, старый ETag не совпадёт
+        # с локальным кэшем метка тоже живёт недолго, иначе ETag других процессов не сменится
+        cache.add(quiz_version_key(quiz_id), time.time_ns(), get_cache_timeout(None))
+        version = cache.get(quiz_version_key(quiz_id))
+    return version
+
+
+def bump_quiz_version(quiz_id):
+    try:
+        cache.incr(quiz_version_key(quiz_id))
+    except ValueError:
+        cache.set(quiz_version_key(quiz_id), time.time_ns(), get_cache_timeout(None))
+
+
+def quiz_etag(quiz_id):
+    return f"quiz-{quiz_id}-{get_quiz_version(quiz_id)}"
+
+
+def build_quiz_payload(quiz):
+    """Весь квиз одним документом: вопросы по порядку, варианты, картинки, итоги."""
+    questions = [
+        {
+            'id': question.pk,
+            'question': question.text,
+            'image': question.image.url if question.image else None,
+            'question_type': question.question_type,
+            'choices': question.choice_list if question.question_type in ['multiple', 'single'] else [],
+            'points': question.points,
+        }
+        for question in quiz.questions.order_by('id')
+    ]
+    return {
+        'id': quiz.pk,
+        'title': quiz.title,
+        'total_points': quiz.points_total,
+        'total_questions': len(questions),
+        'questions': questions,
+    }
+
+
+def get_quiz_payload(quiz_id):
+    """
+    Документ квиза из кэша. Сбрасывается сигналами при правке квиза
+    и его вопросов (см. signals.py).
+    """
+    key = f"quiz_payload:{get_quiz_version(quiz_id)}:{quiz_id}"
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    quiz = Quiz.objects.filter(pk=quiz_id).first()
+    if quiz is None:
+        raise Http404("Quiz not found")
+
+    payload = build_quiz_payload(quiz)
+    cache.set(key, payload, get_cache_timeout(QUIZ_PAYLOAD_TIMEOUT))
+    return payload
@@ -0,0 +1,60 @@
+# apps/users/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from .models import Page, Content, Video, FunFact, Challenge, ChitChat, Quiz, QuizQuestion, ImageAsset, UserSchool, User
+from .leaderboard import sync_user_schools
+from .progress import invalidate_page_progress
+from .page_manifest import bump_manifest_version
+from .quiz_payload import bump_quiz_version
+from .tasks import generate_image_variants
+
+
+def update_quiz_totals(sender, instance, **kwargs):
+    Quiz.refresh_totals(instance.quiz_id)
+
+
+def invalidate_quiz_payload(sender, instance, **kwargs):
+    bump_quiz_version(instance.pk if sender is Quiz else instance.quiz_id)
+
+
+def queue_image_variants(sender, instance, created, **kwargs):
+    # варианты строятся только для исходных изображений, один раз
+    if created and not instance.source_id and not instance.variant:
+        transaction.on_commit(lambda: generate_image_variants.delay(instance.sha256))
+
+
+def move_user_school_boards(sender, instance, **kwargs):
+    transaction.on_commit(lambda: sync_user_schools(instance.user_id))
+
+
+def reset_page_progress(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # user.completed_content.add(...) или content.completed_by.add(...)
+    if not reverse:
+        invalidate_page_progress([instance.pk])
+    elif pk_set:
+        invalidate_page_progress(pk_set)
+
+
+def invalidate_page_manifests(sender, **kwargs):
+    bump_manifest_version()
+
+
+# Итоги квиза пересчитываются до сброса манифестов, чтобы в кэш попали новые значения
+post_save.connect(update_quiz_totals, sender=QuizQuestion, dispatch_uid='quiz_totals_save')
+post_delete.connect(update_quiz_totals, sender=QuizQuestion, dispatch_uid='quiz_totals_delete')
+for model in (Quiz, QuizQuestion):
+    post_save.connect(invalidate_quiz_payload, sender=model, dispatch_uid=f'quiz_payload_save_{model.__name__}')
+    post_delete.connect(invalidate_quiz_payload, sender=model, dispatch_uid=f'quiz_payload_delete_{model.__name__}')
+post_save.connect(queue_image_variants, sender=ImageAsset, dispatch_uid='image_asset_variants')
+post_save.connect(move_user_school_boards, sender=UserSchool, dispatch_uid='leaderboard_school_save')
+post_delete.connect(move_user_school_boards, sender=UserSchool, dispatch_uid='leaderboard_school_delete')
+m2m_changed.connect(reset_page_progress, sender=User.completed_content.through, dispatch_uid='page_progress_completed')
+
+for model in (Page, Content, Video, FunFact, Challenge, ChitChat, Quiz, QuizQuestion):
+    post_save.connect(invalidate_page_manifests, sender=model,
+                      dispatch_uid=f'page_manifest_save_{model.__name__}')
+    post_delete.connect(invalidate_page_manifests, sender=model,
+                        dispatch_uid=f'page_manifest_delete_{model.__name__}')
@@ -1,15 +1,176 @@
+import os
+import tempfile
+import uuid
+
 from celery import shared_task
-from .models import ChallengeUserAnswer
-import time
+from django.core.files import File
+
+from .models import ChallengeUserAnswer, ImageAsset, User, Video
+from .page_manifest import bump_manifest_version
+from .chitchat import reconcile_tallies
+from . import video_processing
 
 @shared_task
 def process_uploaded_file(file_id):
+    """
+    Видео-ответ: длительность и кодек, веб-версия H.264/AAC и постер.
+    """
     try:
         answer = ChallengeUserAnswer.objects.get(id=file_id)
-
-        # Тут можно обрабатывать файл: извлекать метаданные, конвертировать, отправлять куда-то и т.д.
-        print(f"Начинаем обработку файла: {answer.file.name}")
-        time.sleep(5)  # имитация долгой задачи
-        print(f"Файл {answer.file.name} успешно обработан")
     except ChallengeUserAnswer.DoesNotExist:
         print(f"Файл с id {file_id} не найден")
+        return
+
+    if not answer.file:
+        return
+
+    source_name = answer.file.name
+    # если файл заменят во время обработки, результат не запишется
+    answers = ChallengeUserAnswer.objects.filter(pk=answer.pk, file=source_name)
+    answers.update(processing_status='processing', processing_error='')
+
+    print(f"Начинаем обработку файла: {source_name}")
+    source_path = None
+    try:
+        source_path = video_processing.download_to_tempfile(answer.file)
+        info = video_processing.probe_video(source_path)
+
+        poster = ImageAsset.from_bytes(video_processing.extract_poster(source_path, info['duration']))
+
+        if video_processing.is_web_friendly(source_path, info):
+            processed_name = source_name
+        else:
+            with tempfile.NamedTemporaryFile(suffix='.mp4') as target:
+                if video_processing.is_web_compatible(source_path, info):
+                    video_processing.remux_faststart(source_path, target.name)
+                else:
+                    video_processing.transcode_web(source_path, target.name)
+                base = os.path.splitext(os.path.basename(source_name))[0]
+                processed_name = answer.processed_file.storage.save(f"usersvideo/web/{base}.mp4", File(target))
+    except Exception as e:
+        print(f"Ошибка обработки файла {source_name}: {e}")
+        answers.update(processing_status='failed', processing_error=str(e))
+        return
+    finally:
+        if source_path:
+            os.remove(source_path)
+
+    answers.update(
+        processing_status='ready',
+        processed_file=processed_name,
+        duration_seconds=info['duration'],
+        video_codec=info['codec'],
+        poster_asset=poster.sha256,
+    )
+    print(f"Файл {source_name} успешно обработан")
+
+
+@shared_task
+def ingest_video(video_id):
+    """
+    Один проход по загруженному видео: длительность в секундах и постер
+    (из poster_url или кадр из ролика, если постер не загружен).
+    """
+    video = Video.objects.filter(pk=video_id).first()
+    if not video or not video.video_file:
+        return
+
+    source_name = video.video_file.name
+    updates = {}
+    video_path = None
+    try:
+        if video.duration_seconds is None or (not video.poster_url and not video.poster_asset_id):
+            video_path = video_processing.download_to_tempfile(video.video_file)
+            seconds = round(video_processing.probe_video(video_path)['duration'])
+            video.duration_seconds = updates['duration_seconds'] = seconds
+            if not video.duration:
+                updates['duration'] = Video.format_duration(seconds)
+
+        if not video.poster_asset_id:
+            poster = video.render_poster(video_path)
+            if poster:
+                updates['poster_asset'] = poster.sha256
+    except Exception as e:
+        print(f"Error ingesting video {video_id}: {e}")
+    finally:
+        if video_path:
+            os.remove(video_path)
+
+    # update() не шлёт post_save, поэтому манифесты страниц сбрасываем сами
+    if updates and Video.objects.filter(pk=video_id, video_file=source_name).update(**updates):
+        bump_manifest_version()
+
+
+@shared_task
+def package_video_hls(video_id):
+    """
+    HLS-варианты 360p/720p/1080p (не выше исходника) и master-плейлист
+    в бакете video_file. Пока задача не отработала, играется исходный MP4.
+    """
+    video = Video.objects.filter(pk=video_id).first()
+    if not video or not video.video_file:
+        return
+
+    source_name = video.video_file.name
+    storage = video.video_file.storage
+    prefix = f"hls_{video.pk}_{uuid.uuid4().hex[:8]}"
+    video_path = None
+    try:
+        video_path = video_processing.download_to_tempfile(video.video_file)
+        info = video_processing.probe_video(video_path)
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            master = video_processing.package_hls(video_path, output_dir, prefix, (info['width'], info['height']))
+
+            # master последним: ссылка на него появляется, когда всё остальное уже лежит в бакете
+            names = sorted(os.listdir(output_dir), key=lambda name: (name == master, name.endswith('.m3u8'), name))
+            for name in names:
+                with open(os.path.join(output_dir, name), 'rb') as f:
+                    storage.save(name, File(f))
+    except Exception as e:
+        print(f"Error packaging HLS for video {video_id}: {e}")
+        return
+    finally:
+        if video_path:
+            os.remove(video_path)
+
+    Video.objects.filter(pk=video_id, video_file=source_name).update(hls_manifest=master)
+    print(f"HLS для видео {video_id} готов: {master}")
+
+
+@shared_task
+def generate_image_variants(sha256):
+    try:
+        # аватары уже готовые рендеры, варианты для них не нужны
+        asset = ImageAsset.objects.exclude(variant='avatar').get(sha256=sha256, source__isnull=True)
+    except ImageAsset.DoesNotExist:
+        print(f"Изображение {sha256} не найдено")
+        return
+
+    created = asset.generate_variants()
+    print(f"Для изображения {sha256[:12]} создано вариантов: {len(created)}")
+
+
+@shared_task
+def render_user_avatar(user_id, picture_name):
+    user = User.objects.filter(pk=user_id).first()
+    if not user or user.profile_picture.name != picture_name:
+        # фото уже поменяли, этим займётся следующая задача
+        return
+
+    try:
+        asset = user.render_avatar()
+    except Exception as e:
+        print(f"Error rendering avatar for user {user_id}: {e}")
+        return
+
+    User.objects.filter(pk=user_id, profile_picture=picture_name).update(avatar_asset=asset.sha256)
+
+
+@shared_task
+def reconcile_chitchat_tallies():
+    # запускается по расписанию (CELERY_BEAT_SCHEDULE)
+    fixed = reconcile_tallies()
+    if fixed:
+        print(f"Исправлены счётчики Chit Chat: {fixed} пар")
+    return fixed
@@ -30,6 +30,7 @@ urlpatterns = [
     path('auth/', include('social_django.urls', namespace='social')),  # оставить с namespace
     path('social-auth/', include('social_django.urls')),  # убрать namespace
     path('redeem-reward/', views.redeem_reward, name='redeem_reward'),
+    path('leaderboard/', views.leaderboard_view, name='leaderboard'),
     path('custom-redirect/', views.redirect_view, name='custom_redirect'),
 
     path('events/', views.events_page, name='events_page'),
@@ -57,6 +58,10 @@ urlpatterns = [
     # path('rel_money/', views.eighth_page, name='eighth_page'),
     path('get_objects/', get_objects, name='get_objects'),
     path('toggle-like/<str:model>/<int:object_id>/', views.toggle_like, name='toggle_like'),
+    path('images/<slug:sha256>/', views.image_asset, name='image_asset'),
+    path('images/<slug:sha256>/<slug:variant>/', views.image_variant, name='image_variant'),
+    path('stream/video/<int:video_id>/<path:name>', views.video_stream, name='video_stream'),
+    path('stream/answer/<int:answer_id>/<path:name>', views.answer_stream, name='answer_stream'),
 
     path('video/<int:video_id>/', views.video_detail, name='video_detail'),
     path('fun_fact/<int:fun_fact_id>/', views.fun_fact_detail, name='fun_fact_detail'),
@@ -68,6 +73,8 @@ urlpatterns = [
     path('challenge/<int:pk>/add-content/', views.challenge_add_content, name='challenge_add_content'),
     path('challenge/<int:challenge_id>/submit/', views.submit_challenge, name='submit_challenge'),
     path('challenge/<int:challenge_id>/submit-in-add/', views.submit_challenge_in_add, name='submit_challenge_in_add'),
+    path('challenge/<int:challenge_id>/upload/', views.challenge_upload_start, name='challenge_upload_start'),
+    path('challenge/upload/complete/', views.challenge_upload_complete, name='challenge_upload_complete'),
     path('challenge/<int:pk>/view/', views.challenge_view_content, name='challenge_view_content'),
     path('mark_done/<int:attempt_id>/', views.mark_done, name='mark_done'),
     path('mark_undone/<int:attempt_id>/', views.mark_undone, name='mark_undone'),
@@ -85,6 +92,7 @@ urlpatterns = [
     path('quiz/<int:pk>/', views.quiz_detail, name='quiz_detail'),
     path('quiz_start/<int:pk>/', views.quiz_detail_welcome, name='quiz_detail_welcome'),
     path('quiz/<int:quiz_id>/', views.quiz_start, name='quiz_start'),
+    path('quiz/<int:quiz_id>/payload/', views.quiz_payload, name='quiz_payload'),
     path('quiz/<int:quiz_id>/question/<int:question_num>/', views.get_question, name='get_question'),
     path('quiz/submit/', views.submit_answer, name='submit_answer'),
     path('quiz/results/<int:pk>/', views.quiz_results, name='quiz_results'),
@@ -0,0 +1,187 @@
+# apps/users/video_processing.py
+import os
+import subprocess
+import tempfile
+
+import imageio_ffmpeg
+
+# Веб-версия: H.264/AAC, не шире 1280px, с ограниченным битрейтом
+WEB_MAX_WIDTH = 1280
+WEB_VIDEO_CRF = 23
+WEB_VIDEO_MAXRATE = '2500k'
+WEB_VIDEO_BUFSIZE = '5000k'
+WEB_AUDIO_BITRATE = '128k'
+
+# Общий битрейт файла, который отдаём без перекодирования: видео + звук
+# и немного на контейнер
+WEB_MAX_BITRATE = int((int(WEB_VIDEO_MAXRATE[:-1]) + int(WEB_AUDIO_BITRATE[:-1])) * 1000 * 1.1)
+
+FFMPEG_TIMEOUT = 60 * 30
+
+
+def run_ffmpeg(*args):
+    command = [imageio_ffmpeg.get_ffmpeg_exe(), '-hide_banner', '-loglevel', 'error', '-y', *args]
+    result = subprocess.run(command, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace')[-500:]}")
+    return result.stdout
+
+
+def download_to_tempfile(field_file):
+    """
+    Скачивает файл из хранилища по кускам во временный файл на диске
+    (ffmpeg нужен путь). Удалить файл должен вызывающий.
+    """
+    suffix = os.path.splitext(field_file.name)[1]
+    tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    try:
+        with field_file.open('rb') as source:
+            for chunk in source.chunks():
+                tmp.write(chunk)
+    finally:
+        tmp.close()
+    return tmp.name
+
+
+def probe_video(path):
+    """Длительность (сек), кодек и размер кадра без декодирования всего файла."""
+    reader = imageio_ffmpeg.read_frames(path)
+    try:
+        meta = next(reader)
+    finally:
+        reader.close()
+
+    width, height = meta.get('source_size') or meta.get('size') or (None, None)
+    duration = meta.get('duration') or 0
+    return {
+        'duration': duration,
+        'codec': (meta.get('codec') or '').split(' ')[0],
+        'audio_codec': (meta.get('audio_codec') or '').split(' ')[0] or None,
+        # средний битрейт по размеру файла: ffmpeg без декодирования его не сообщает
+        'bitrate': os.path.getsize(path) * 8 / duration if duration else None,
+        'width': width,
+        'height': height,
+        'fps': meta.get('fps'),
+    }
+
+
+def is_faststart(path):
+    """moov перед mdat: браузер начинает играть, не дожидаясь конца файла."""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return False
+            size = int.from_bytes(header[:4], 'big')
+            box = header[4:]
+            if box == b'moov':
+                return True
+            if box == b'mdat':
+                return False
+            if size == 1:
+                size = int.from_bytes(f.read(8), 'big') - 8
+            elif size == 0:
+                return False
+            f.seek(size - 8, os.SEEK_CUR)
+
+
+def is_web_compatible(path, info):
+    """Кодеки, размер и битрейт подходят веб-версии (перекодировать не нужно)."""
+    return (
+        info['codec'] == 'h264'
+        and info['audio_codec'] in (None, 'aac')
+        and (info['width'] or 0) <= WEB_MAX_WIDTH
+        and info['bitrate'] is not None and info['bitrate'] <= WEB_MAX_BITRATE
+        and os.path.splitext(path)[1].lower() == '.mp4'
+    )
+
+
+def is_web_friendly(path, info):
+    return is_web_compatible(path, info) and is_faststart(path)
+
+
+def remux_faststart(source_path, target_path):
+    """Переносит moov в начало без перекодирования."""
+    run_ffmpeg(
+        '-i', source_path,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-c', 'copy',
+        '-movflags', '+faststart',
+        target_path,
+    )
+
+
+def transcode_web(source_path, target_path):
+    run_ffmpeg(
+        '-i', source_path,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', f"scale='min({WEB_MAX_WIDTH},iw)':-2",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'high', '-pix_fmt', 'yuv420p',
+        '-crf', str(WEB_VIDEO_CRF), '-maxrate', WEB_VIDEO_MAXRATE, '-bufsize', WEB_VIDEO_BUFSIZE,
+        '-c:a', 'aac', '-b:a', WEB_AUDIO_BITRATE, '-ac', '2',
+        # moov в начале файла — воспроизведение стартует до полной загрузки
+        '-movflags', '+faststart',
+        target_path,
+    )
+
+
+def extract_poster(path, duration=None):
+    """JPEG-кадр из первой секунды (или середины коротких роликов)."""
+    position = min(1.0, duration / 2) if duration else 0
+    return run_ffmpeg(
+        '-ss', f"{position:.3f}",
+        '-i', path,
+        '-frames:v', '1',
+        '-f', 'image2', '-c:v', 'mjpeg', '-q:v', '3',
+        'pipe:1',
+    )
+
+
+# HLS-лесенка: (высота, битрейт видео, битрейт звука)
+HLS_RENDITIONS = [
+    (360, '800k', '96k'),
+    (720, '2800k', '128k'),
+    (1080, '5000k', '192k'),
+]
+HLS_SEGMENT_SECONDS = 6
+
+
+def package_hls(source_path, output_dir, prefix, source_size=None):
+    """
+    Нарезает видео на HLS-варианты и пишет master-плейлист в output_dir.
+    Все файлы плоские (prefix_720p.m3u8, prefix_720p_00001.ts, ...), ссылки
+    в плейлистах относительные. Возвращает имя master-плейлиста.
+    """
+    source_width, source_height = source_size or (None, None)
+    renditions = [r for r in HLS_RENDITIONS if not source_height or r[0] <= source_height] or HLS_RENDITIONS[:1]
+
+    master_lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-INDEPENDENT-SEGMENTS']
+    for height, video_bitrate, audio_bitrate in renditions:
+        playlist = f"{prefix}_{height}p.m3u8"
+        run_ffmpeg(
+            '-i', source_path,
+            '-map', '0:v:0', '-map', '0:a:0?',
+            '-vf', f"scale=-2:{height}",
+            '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+            '-b:v', video_bitrate, '-maxrate', video_bitrate, '-bufsize', f"{int(video_bitrate[:-1]) * 2}k",
+            # ключевой кадр на границе каждого сегмента, чтобы варианты переключались ровно
+            '-force_key_frames', f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})", '-sc_threshold', '0',
+            '-c:a', 'aac', '-b:a', audio_bitrate, '-ac', '2',
+            '-f', 'hls',
+            '-hls_time', str(HLS_SEGMENT_SECONDS),
+            '-hls_playlist_type', 'vod',
+            '-hls_flags', 'independent_segments',
+            '-hls_segment_filename', os.path.join(output_dir, f"{prefix}_{height}p_%05d.ts"),
+            os.path.join(output_dir, playlist),
+        )
+
+        bandwidth = (int(video_bitrate[:-1]) + int(audio_bitrate[:-1])) * 1000
+        aspect = source_width / source_height if source_width and source_height else 16 / 9
+        width = round(height * aspect / 2) * 2
+        master_lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={width}x{height}")
+        master_lines.append(playlist)
+
+    master = f"{prefix}_master.m3u8"
+    with open(os.path.join(output_dir, master), 'w') as f:
+        f.write('\n'.join(master_lines) + '\n')
+    return master
@@ -3,7 +3,7 @@ from datetime import datetime
 import json
 import re
 
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.utils import timezone
 from django.contrib.auth.forms import PasswordResetForm
 from django.contrib.auth.decorators import login_required
@@ -11,15 +11,17 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, etag
 from .forms import RegistrationForm
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404, HttpResponse, HttpResponseNotModified
 from django.contrib.contenttypes.models import ContentType
 from .models import Video, FunFact, Content, Challenge, ChitChat, ChitChatOption, ChitChatUserChoice, \
     ChallengeUserAnswer, ChallengeUserChoice, ChitChatAnswer, ChallengeUserAttempt, Schools, UserSchool, Quiz, \
-    QuizUserChoice, QuizAnswer, QuizQuestion, Invitation, Glossary, Favourites, UserReward, Rewards, Page
+    QuizUserChoice, QuizAnswer, QuizQuestion, Invitation, Glossary, Favourites, UserReward, Rewards, Page, ImageAsset, \
+    ImageVariant, IMAGE_VARIANT_FORMATS
 from django.contrib.auth import authenticate, login, get_backends, logout
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q
 from django.contrib.auth import get_user_model
 from collections import defaultdict
@@ -28,7 +30,17 @@ from django.conf import settings
 from utils.supabase_upload import upload_user_avatar
 from utils.generate_avatar import generate_initial_avatar
 import logging
-from .tasks import process_uploaded_file
+from .page_manifest import CONTENT_MODELS, get_page_manifest
+from .content_resolver import ContentResolver
+from .challenge_display import AttemptRenderModel
+from .challenge_submissions import submit_attempt, update_attempt
+from .chitchat import parse_answers, save_answers
+from .quiz_payload import get_quiz_payload, quiz_etag
+from .progress import get_page_progress
+from .direct_uploads import start_upload, complete_upload
+from .media_stream import stream_object
+from .points import award_points, content_key, redeem
+from . import leaderboard
 
 
 User = get_user_model()
@@ -70,43 +82,21 @@ def favourites_page(request):
         return render(request, 'videos/favourites_page.html', {'contents': []})
 
     # Все лайки пользователя
-    favourites = Favourites.objects.filter(user=request.user).select_related('content_type')
+    favourites = Favourites.objects.filter(
+        user=request.user, content_type__model__in=CONTENT_MODELS
+    ).select_related('content_type')
 
     if not favourites.exists():
         return render(request, 'videos/favourites_page.html', {'contents': []})
 
-    # Группируем id по типу контента
-    objects_by_type = defaultdict(list)
-    ct_by_model = {}  # чтобы потом быстро получить ContentType
-
-    for fav in favourites:
-        model_name = fav.content_type.model
-        objects_by_type[model_name].append(fav.object_id)
-        ct_by_model[model_name] = fav.content_type
-
-    # Загружаем объекты одним запросом на тип
-    videos    = Video.objects.in_bulk(objects_by_type.get('video', []))
-    funfacts  = FunFact.objects.in_bulk(objects_by_type.get('funfact', []))
-    challenges = Challenge.objects.in_bulk(objects_by_type.get('challenge', []))
-    chitchats = ChitChat.objects.in_bulk(objects_by_type.get('chitchat', []))
-    quizzes   = Quiz.objects.in_bulk(objects_by_type.get('quiz', []))
+    # Объекты всех типов — по одному in_bulk на тип
+    favourites = ContentResolver().attach(favourites, 'content_object')
 
     filtered_contents = []
 
     for fav in favourites:
         model = fav.content_type.model
-        obj = None
-
-        if model == 'video':
-            obj = videos.get(fav.object_id)
-        elif model == 'funfact':
-            obj = funfacts.get(fav.object_id)
-        elif model == 'challenge':
-            obj = challenges.get(fav.object_id)
-        elif model == 'chitchat':
-            obj = chitchats.get(fav.object_id)
-        elif model == 'quiz':
-            obj = quizzes.get(fav.object_id)
+        obj = fav.content_object
 
         if not obj or not getattr(obj, 'title', None):
             continue
@@ -122,17 +112,15 @@ def favourites_page(request):
         content.is_liked         = True                       # на странице избранного всегда True
         content.value            = obj                        # ← основной объект модели
         content.quiz             = None
-        content.poster_base64    = getattr(obj, 'poster_base64', None) if model == 'video' else None
+        content.poster_card_url  = obj.poster_card_url if model == 'video' else None
 
         # duration и points — как в основной логике
         content.duration = getattr(obj, 'duration', None)
         content.points   = getattr(obj, 'points', None)
 
         if model == 'quiz':
-            total_points = sum(q.points for q in obj.questions.all())
-            content.points = total_points
-            content.quiz = obj
-            content.quiz.total_points = total_points   # для шаблона {{ content.quiz.total_points }}
+            content.points = obj.total_points()
+            content.quiz = obj                         # для шаблона {{ content.quiz.total_points }}
 
         # Для совместимости с условиями вида content.value.duration / content.value.points
         # (хотя теперь можно использовать content.duration и content.points напрямую)
@@ -221,7 +209,6 @@ def user_profile(request):
         'hobbies_list': hobbies_list,
         'completed_count': completed_count,
         'rewards': rewards,
-        'user_profile_picture_base64': user.get_profile_picture_base64(),
         'member_since': formatted_date,  # Добавляем в контекст
     })
 
@@ -326,23 +313,13 @@ def redeem_reward(request):
         reward = get_object_or_404(Rewards, id=reward_id)
         user = request.user
 
-        if user.points_count < reward.points_needed:
+        # Создание записи о награде и списание баллов одной транзакцией
+        if not redeem(user, reward):
             return JsonResponse({
                 'success': False,
                 'error': 'Not enough points to redeem this reward'
             })
 
-        # Создание записи о награде
-        UserReward.objects.create(
-            user=user,
-            reward=reward,
-            points_spent=reward.points_needed
-        )
-
-        # Списание баллов
-        user.points_count -= reward.points_needed
-        user.save()
-
         # Отправка email
         subject = f'New Reward Redeemed: {reward.title}'
         message = f'''
@@ -377,6 +354,39 @@ def redeem_reward(request):
     })
 
 
+@login_required
+def leaderboard_view(request):
+    """
+    Топ и место пользователя с соседями.
+    ?scope=global | school (по assigned_code пользователя) | page&page=<slug>
+    """
+    scope = request.GET.get('scope', 'global')
+
+    if scope == 'school':
+        code = UserSchool.objects.filter(user=request.user, assigned_code__isnull=False) \
+            .values_list('assigned_code', flat=True).first()
+        if code is None:
+            return JsonResponse({'success': False, 'error': 'No school assigned'}, status=404)
+        board = leaderboard.school_board(code)
+    elif scope == 'page':
+        page = get_object_or_404(Page, slug=request.GET.get('page'), is_active=True)
+        board = leaderboard.page_board(page.pk)
+    else:
+        board = leaderboard.global_board()
+
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), 100))
+    except ValueError:
+        limit = 10
+
+    return JsonResponse({
+        'success': True,
+        'scope': scope,
+        'top': leaderboard.top(board, limit),
+        'me': leaderboard.around(board, request.user.pk),
+    })
+
+
 def signup_complete(request):
     return render(request, 'users/signup_complete.html')
 
@@ -411,14 +421,12 @@ def register(request):
 
             if invitation:
                 invitation.accepted = True
-                invitation.save()
+                invitation.save(update_fields=['accepted'])
 
-                user.points_count += 100
+                award_points(user, 100, f"invite:{invitation.pk}", 'invite')
                 inviter = User.objects.filter(email__iexact=invitation.inviter.email).first()
                 if inviter:
-                    inviter.points_count += 150
-                    inviter.save()
-                user.save()
+                    award_points(inviter, 150, f"invite:{invitation.pk}", 'invite')
 
                 send_mail(...)  # Без изменений
 
@@ -506,7 +514,7 @@ def about_me_view(request):
         if request.FILES.get('avatar'):
             user.profile_picture = request.FILES['avatar']
 
-        user.save()
+        user.save(update_fields=['first_name', 'last_name', 'curr_city', 'hometown', 'date_of_birth', 'profile_picture'])
 
         # --- SCHOOLS ---
         UserSchool.objects.filter(user=user).delete()
@@ -577,7 +585,7 @@ def your_next_move_view(request):
             values = []
 
         user.next_move = ';; '.join([v.strip() for v in values if v.strip()])
-        user.save()
+        user.save(update_fields=['next_move'])
 
         # Возвращаемся в зависимости от режима
         if edit_mode and next_url:
@@ -610,7 +618,7 @@ def current_vibe_view(request):
         next_url = request.POST.get('next')
 
         user.current_vibe = request.POST.get('vibe', '').strip()
-        user.save()
+        user.save(update_fields=['current_vibe'])
 
         # Возвращаемся в зависимости от режима
         if edit_mode and next_url:
@@ -654,7 +662,7 @@ def industry_field_view(request):
 
         # сохранение через ;;
         user.industry = ';; '.join(clean_values)
-        user.save()
+        user.save(update_fields=['industry'])
 
         # Возвращаемся в зависимости от режима
         if edit_mode and next_url:
@@ -698,7 +706,7 @@ def who_are_you_today_view(request):
             values = []
 
         user.you_today = ';; '.join([v.strip() for v in values if v.strip()])
-        user.save()
+        user.save(update_fields=['you_today'])
 
         # Возвращаемся в зависимости от режима
         if edit_mode and next_url:
@@ -830,7 +838,7 @@ def save_profile_steps(request):
                     # Школа не найдена, пропускаем
                     continue
 
-        user.save()
+        user.save(update_fields=['profile_picture'])
         return redirect('home')
 
     return render(request, 'users/profile.html')
@@ -898,7 +906,12 @@ def generate_initial_avatar(user):
 
 
 def home_view(request):
-    pages = Page.objects.filter(is_active=True).order_by('order')
+    pages = list(Page.objects.filter(is_active=True).order_by('order'))
+
+    progress = get_page_progress(request.user)
+    for page in pages:
+        page.progress = progress.get(page.pk, {'completed': 0, 'total': 0, 'points': 0, 'percent': 0})
+
     return render(request, 'videos/home_page.html', {
         'pages': pages
     })
@@ -1013,66 +1026,20 @@ def welcome_video(request):
 
 
 def dynamic_page(request, slug):
-    page = get_object_or_404(Page, slug=slug, is_active=True)
-
-    content_types = ContentType.objects.filter(
-        model__in=['video', 'funfact', 'challenge', 'chitchat', 'quiz']
-    )
-
-    contents = Content.objects.filter(
-        content_type__in=content_types,
-        page=page
-    ).select_related('content_type').order_by('order')
-
-    from collections import defaultdict
-    objects_by_type = defaultdict(list)
-
-    for content in contents:
-        objects_by_type[content.content_type.model].append(content.object_id)
-
-    videos = Video.objects.in_bulk(objects_by_type.get('video', []))
-    funfacts = FunFact.objects.in_bulk(objects_by_type.get('funfact', []))
-    challenges = Challenge.objects.in_bulk(objects_by_type.get('challenge', []))
-    chitchats = ChitChat.objects.in_bulk(objects_by_type.get('chitchat', []))
-    quizzes = Quiz.objects.in_bulk(objects_by_type.get('quiz', []))
+    # Общая часть страницы берётся из кэша, поверх неё — данные пользователя
+    manifest = get_page_manifest(slug)
+    if manifest is None:
+        raise Http404("Page not found")
 
-    filtered_contents = []
-
-    for content in contents:
-        obj = None
-        model = content.content_type.model
-
-        if model == 'video':
-            obj = videos.get(content.object_id)
-        elif model == 'funfact':
-            obj = funfacts.get(content.object_id)
-        elif model == 'challenge':
-            obj = challenges.get(content.object_id)
-        elif model == 'chitchat':
-            obj = chitchats.get(content.object_id)
-        elif model == 'quiz':
-            obj = quizzes.get(content.object_id)
-            if obj and obj.title:
-                content.quiz = obj
-                content.quiz.total_points = sum(q.points for q in obj.questions.all())
-
-        if not obj or not getattr(obj, 'title', None):
-            continue
-
-        content.obj = obj
-        content.duration = getattr(obj, 'duration', None)
-        content.points = getattr(obj, 'points', None)
-        if model == 'quiz':
-            content.points = obj.total_points
-
-        filtered_contents.append(content)
+    page = manifest['page']
+    filtered_contents = manifest['contents']
 
     # 🔒 ВЫЧИСЛЯЕМ is_available ДЛЯ ВСЕХ (включая неавторизованных)
     if request.user.is_authenticated:
-        # Предзагружаем completed_content для производительности
-        completed_ids = set(request.user.completed_content.values_list('pk', flat=True))
+        # Карта доступности всей страницы: два запроса вместо 2N
+        availability = page.availability_for(request.user, rows=manifest['unlock_rows'])
         for c in filtered_contents:
-            c.is_available = c.is_available_for_user(request.user, completed_ids=completed_ids)
+            c.is_available = availability.get(c.pk, False)
     else:
         for c in filtered_contents:
             c.is_available = False  # Или True, если хотите показывать всё неавторизованным
@@ -1158,6 +1125,69 @@ def toggle_like(request, model, object_id):
 
     return JsonResponse({"liked": True})
 
+@etag(lambda request, sha256: sha256)
+def image_asset(request, sha256):
+    # Адрес зависит от содержимого, поэтому ответ можно кэшировать навсегда (браузер, CDN)
+    asset = get_object_or_404(ImageAsset.objects.only('mime_type', 'data'), sha256=sha256)
+    response = HttpResponse(bytes(asset.data), content_type=asset.mime_type)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+def image_variant(request, sha256, variant):
+    # Выбираем лучший формат из поддерживаемых браузером (Accept), иначе отдаём исходник
+    accept = request.headers.get('Accept', '')
+    candidates = dict(
+        ImageVariant.objects.filter(source_id=sha256, name=variant).values_list('mime_type', 'asset_id')
+    )
+
+    chosen = None
+    for mime_type, _, _ in IMAGE_VARIANT_FORMATS:
+        if mime_type in candidates and (mime_type == 'image/jpeg' or mime_type in accept):
+            chosen = candidates[mime_type]
+            break
+
+    if request.headers.get('If-None-Match') == f'"{chosen or sha256}"':
+        response = HttpResponseNotModified()
+    else:
+        asset = get_object_or_404(ImageAsset.objects.only('mime_type', 'data'), sha256=chosen or sha256)
+        response = HttpResponse(bytes(asset.data), content_type=asset.mime_type)
+
+    response['ETag'] = f'"{chosen or sha256}"'
+    response['Vary'] = 'Accept'
+    if chosen:
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        # вариант ещё не готов — не кэшируем исходник надолго
+        response['Cache-Control'] = 'public, max-age=300'
+    return response
+
+
+def video_stream(request, video_id, name):
+    """
+    Видео через наш домен: Range/206, ETag и долгий кэш (имя файла в URL
+    меняется вместе с файлом), можно ставить за CDN.
+    """
+    video = get_object_or_404(Video, id=video_id)
+    if not video.video_file:
+        raise Http404("Video has no file")
+    if name != video.video_file.name:
+        return redirect(video.stream_url)
+
+    return stream_object(request, video.video_file.storage, name, 'public, max-age=31536000, immutable')
+
+
+@login_required
+def answer_stream(request, answer_id, name):
+    answer = get_object_or_404(ChallengeUserAnswer.objects.select_related('attempt__choice'), id=answer_id)
+    if answer.attempt.choice.user_id != request.user.id and not request.user.is_staff:
+        raise Http404("Answer not found")
+    if name not in (answer.file.name, answer.processed_file.name) or not name:
+        raise Http404("File not found")
+
+    # ответы пользователей не должны оседать в общих кэшах
+    return stream_object(request, answer.file.storage, name, 'private, max-age=31536000, immutable')
+
+
 def signout(request):
     logout(request)
     return redirect('login')
@@ -1192,10 +1222,8 @@ def video_detail(request, video_id):
 
         # Если видео ещё не просмотрено
         if not request.user.completed_content.filter(pk=content.pk).exists():
-            points_added = video.points  # предполагаем, что у модели Video есть поле points
-            request.user.points_count += points_added
+            points_added = award_points(request.user, video.points, content_key(video), 'video')
             request.user.completed_content.add(content)
-            request.user.save()
 
     return render(request, 'videos/video.html', {
         'video': video,
@@ -1231,10 +1259,8 @@ def fun_fact_detail(request, fun_fact_id):
 
         # Проверяем, просмотрен ли уже
         if not request.user.completed_content.filter(pk=content.pk).exists():
-            points_added = fun_fact.points
-            request.user.points_count += points_added
+            points_added = award_points(request.user, fun_fact.points, content_key(fun_fact), 'funfact')
             request.user.completed_content.add(content)
-            request.user.save()
             added_to_completed = True
 
     return render(request, 'videos/fun_fact.html', {
@@ -1262,6 +1288,7 @@ def chitchat_detail(request, pk):
     for opt in options:
         opt.user_answer = answers_dict.get(opt.id, '')
 
+    # Проценты ответов — из счётчиков самих пар (option.option_1_percent), без агрегатов по ответам
     context = {
         'chit_chat': chitchat,
         'option_pairs': options,
@@ -1370,33 +1397,21 @@ def chitchat_submit(request, pk):
             chit_chat=chitchat,
             user=request.user
         )
-        user_choice.answers.all().delete()
 
-        # Обработка ответов
-        data = request.POST
-        for key, value in data.items():
-            if key.startswith('pair-'):
-                try:
-                    option_pair_id = int(key.split('-')[1])
-                    option_pair = ChitChatOption.objects.get(id=option_pair_id)
-                    ChitChatAnswer.objects.create(
-                        user_choice=user_choice,
-                        option_pair=option_pair,
-                        answer=value
-                    )
-                except (ValueError, ChitChatOption.DoesNotExist) as e:
-                    logger.warning(f"Invalid option id or missing option: {key} - {e}")
-                    continue
+        # Ответы: проверка пар одним запросом и запись только изменений
+        save_answers(user_choice, parse_answers(chitchat, request.POST))
 
         # Начисление баллов
+        points_added = 0
         if is_first_attempt:
-            request.user.points_count += chitchat.points
+            points_added = award_points(request.user, chitchat.points, content_key(chitchat), 'chitchat')
             request.user.completed_content.add(content)
-            request.user.save()
+
+        if points_added:
             return JsonResponse({
                 'success': True,
-                'points_added': chitchat.points,
-                'message': f'Chit chat done! You get {chitchat.points} points'
+                'points_added': points_added,
+                'message': f'Chit chat done! You get {points_added} points'
             })
 
         return JsonResponse({
@@ -1445,19 +1460,6 @@ def challenge_detail_content(request, challenge_id):
     return render(request, "videos/content.html", {"challenge": challenge})
 
 
-def parse_radio_values(value_string):
-    options = []
-    for raw in value_string.split(","):
-        raw = raw.strip()
-        match = re.match(r"^(.*?)\s*(\(#([^)]*)\))?$", raw)  # Захватываем любые символы между "(#" и ")"
-        if match:
-            label = match.group(1).strip()
-            color_match = match.group(3)  # Извлекаем цвет из группы 3, если он есть
-            color = f"#{color_match}" if color_match else None  # Добавляем "#" перед цветом, если он найден
-            options.append({"label": label, "color": color})
-    return options
-
-
 def challenge_add_content(request, pk):
     challenge = get_object_or_404(Challenge, pk=pk)
 
@@ -1476,7 +1478,7 @@ def challenge_add_content(request, pk):
     elements_with_options = []
     for element in challenge.elements.filter(show_after_confirm=False):
         if element.element in ["radio", "checkbox"]:
-            options = parse_radio_values(element.value)
+            options = element.parsed_options
             elements_with_options.append({
                 "element": element,
                 "options": options,
@@ -1495,12 +1497,16 @@ def challenge_add_content(request, pk):
     })
 
 
-def normalize_label(label):
-    return re.sub(r"\s+", "", label).lower()
-
-
 def challenge_view_content(request, pk):
-    challenge = get_object_or_404(Challenge, pk=pk)
+    # Элементы и настройки вывода (с полями текста и колонками таблицы) — одним prefetch
+    challenge = get_object_or_404(
+        Challenge.objects.select_related('display_settings').prefetch_related(
+            'elements',
+            'display_settings__text_fields__element',
+            'display_settings__table_columns__element',
+        ),
+        pk=pk,
+    )
 
     # Получаем связанную страницу контента
     content_type = ContentType.objects.get_for_model(Challenge)
@@ -1512,16 +1518,16 @@ def challenge_view_content(request, pk):
     content_page = content.page if content else None
     page_slug = content_page.slug if content_page else None
 
-    # Остальной код представления остается без изменений
-    user_choices = ChallengeUserChoice.objects.filter(
+    user_choices = list(ChallengeUserChoice.objects.filter(
         user=request.user,
         challenge=challenge
-    ).prefetch_related('attempts__answers')
+    ).prefetch_related('attempts__answers'))
 
     display_settings = getattr(challenge, 'display_settings', None)
     display_type = display_settings.display_type if display_settings else 'text'
 
-    elements_to_show_after_confirm = challenge.elements.filter(show_after_confirm=True)
+    elements = challenge.elements.all()
+    elements_to_show_after_confirm = [element for element in elements if element.show_after_confirm]
 
     # Добавляем опции для радиокнопок
     for element in elements_to_show_after_confirm:
@@ -1530,77 +1536,19 @@ def challenge_view_content(request, pk):
         else:
             element.options = None
 
-    is_submit_active = user_choices.filter(attempts__is_done=True).count() >= challenge.min_answers_required
-
-    for choice in user_choices:
-        for attempt in choice.attempts.all():
-            block_color = None
+    attempts = [attempt for choice in user_choices for attempt in choice.attempts.all()]
+    if display_type == 'nothing' and attempts:
+        return redirect('challenge_detail', challenge_id=challenge.pk)
 
-            for answer in attempt.answers.all():
-                element = answer.element
+    is_submit_active = sum(1 for attempt in attempts if attempt.is_done) >= challenge.min_answers_required
 
-                if element and element.value:
-                    value = answer.answer
-                    options = parse_radio_values(element.value)
-                    matched = next(
-                        (opt for opt in options if normalize_label(opt['label']) == normalize_label(value)),
-                        None
-                    )
+    # Все ответы уже в памяти — вывод попыток без запросов
+    render_model = AttemptRenderModel(elements, display_settings)
+    for attempt in attempts:
+        render_model.render(attempt, display_type)
 
-                    if matched and matched['color']:
-                        block_color = matched['color']
-                        break
-
-            attempt.block_color = block_color
-
-            if display_type == 'nothing':
-                return redirect('challenge_detail', challenge_id=challenge.pk)
-
-            elif display_type == 'text':
-                attempt.text_display = []
-                if display_settings and hasattr(display_settings, 'text_fields'):
-                    for field in display_settings.text_fields.all():
-                        answer = attempt.answers.filter(element=field.element).first()
-                        value = answer.answer if answer else "—"
-                        color = None
-
-                        if field.element.field_type == 'radio':
-                            options = parse_radio_values(field.element.value)
-                            matched = next(
-                                (opt for opt in options if normalize_label(opt['label']) == normalize_label(value)),
-                                None
-                            )
-                            color = matched['color'] if matched else None
-
-                        attempt.text_display.append({
-                            'label': field.element.name,
-                            'value': value,
-                            'color': color
-                        })
-
-            elif display_type == 'table':
-                attempt.table_cells = []
-                for column in display_settings.table_columns.all():
-                    value = "—"
-                    color = None
-                    if column.element:
-                        answer = attempt.answers.filter(element=column.element).first()
-                        value = answer.answer if answer else "—"
-
-                        if column.element.field_type == 'radio':
-                            options = parse_radio_values(column.element.value)
-                            matched = next(
-                                (opt for opt in options if normalize_label(opt['label']) == normalize_label(value)),
-                                None
-                            )
-                            color = matched['color'] if matched else None
-
-                    attempt.table_cells.append({
-                        'value': value,
-                        'color': color
-                    })
-
-        if display_type == 'table':
+    if display_type == 'table':
+        for choice in user_choices:
             choice.attempts_filtered = choice.attempts.all()
 
     logger.info("Passing to template: %s", {
@@ -1651,43 +1599,11 @@ def submit_challenge(request, challenge_id):
     if request.method == 'POST':
         is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
 
-        try:
-            user_choice, _ = ChallengeUserChoice.objects.get_or_create(
-                user=request.user,
-                challenge=challenge
-            )
-
-            attempt = ChallengeUserAttempt.objects.create(
-                choice=user_choice,
-                is_secondary=True
-            )
-
-            for element in challenge.elements.all():
-                field_name = f"field_{element.id}"
-
-                if element.element == 'file':
-                    uploaded_file = request.FILES.get(field_name)
-                    if uploaded_file:
-                        answer = ChallengeUserAnswer.objects.create(
-                            attempt=attempt,
-                            element=element,
-                            file=uploaded_file,
-                            answer=''  # пустое значение для файла
-                        )
-                        logger.info(f"Запускаем обработку файла в фоне, answer_id={answer.id}")
-                        process_uploaded_file.delay(answer.id)
-                    else:
-                        logger.warning(f"Файл для поля {field_name} не был загружен")
-                else:
-                    answer_value = request.POST.get(field_name)
-                    if answer_value is not None:
-                        ChallengeUserAnswer.objects.create(
-                            attempt=attempt,
-                            element=element,
-                            answer=answer_value
-                        )
+        redirect_url = reverse('challenge_view_content', kwargs={'pk': challenge.id})
 
-            redirect_url = reverse('challenge_view_content', kwargs={'pk': challenge.id})
+        try:
+            # ответы после подтверждения — отдельная попытка, баллы за неё не начисляются
+            submit_attempt(request, challenge, complete=False)
 
             if is_ajax:
                 return JsonResponse({
@@ -1704,6 +1620,8 @@ def submit_challenge(request, challenge_id):
             # Обработка ошибки размера файла (пример)
             if 'Uploaded file is too big' in str(e) or 'Request data too big' in str(e):
                 error_message = 'File is too big: Upload your video!'
+            elif isinstance(e, ValidationError):
+                error_message = ' '.join(e.messages)
             else:
                 error_message = str(e)
 
@@ -1720,7 +1638,7 @@ def submit_challenge(request, challenge_id):
     elements_with_options = []
     for element in challenge.elements.filter(show_after_confirm=False):
         if element.element == "radio":
-            options = parse_radio_values(element.value)
+            options = element.parsed_options
             elements_with_options.append({
                 "element": element,
                 "options": options,
@@ -1738,102 +1656,52 @@ def submit_challenge(request, challenge_id):
 
 @login_required
 @require_POST
-def submit_challenge_in_add(request, challenge_id):
+def challenge_upload_start(request, challenge_id):
+    """
+    Адрес для загрузки видео-ответа напрямую в Storj, минуя web-воркер.
+    Ожидает JSON: element_id, filename, content_type, size.
+    """
     challenge = get_object_or_404(Challenge, id=challenge_id)
-    user = request.user
 
     try:
-        user_choice, _ = ChallengeUserChoice.objects.get_or_create(
-            user=user,
-            challenge=challenge
+        data = json.loads(request.body)
+        element = get_object_or_404(challenge.elements, id=data.get('element_id'))
+        upload = start_upload(
+            request.user,
+            element,
+            data.get('filename', ''),
+            data.get('content_type'),
+            int(data.get('size') or 0),
         )
+    except (ValueError, ValidationError) as e:
+        message = e.messages[0] if isinstance(e, ValidationError) else 'Invalid request'
+        return JsonResponse({'status': 'error', 'message': message}, status=400)
 
-        # Считаем, сколько уже было попыток ДО этой
-        already_attempts_count = ChallengeUserAttempt.objects.filter(
-            choice=user_choice
-        ).count()
+    return JsonResponse({'status': 'success', **upload})
 
-        # Создаем новую попытку
-        attempt = ChallengeUserAttempt.objects.create(
-            choice=user_choice,
-            is_secondary=True
-        )
 
-        # Считаем сколько ответов добавляем в этой попытке
-        new_answer_count = 0
-
-        for element in challenge.elements.all():
-            field_name = f"field_{element.id}"
-            other_field_name = f"{field_name}_other"
-
-            if element.element == 'file':
-                uploaded_file = request.FILES.get(field_name)
-                if uploaded_file:
-                    ChallengeUserAnswer.objects.create(
-                        attempt=attempt,
-                        element=element,
-                        file=uploaded_file,
-                        answer=''
-                    )
-                    new_answer_count += 1
-
-            elif element.element == 'checkbox':
-                selected_values = request.POST.getlist(field_name)
-                other_value = request.POST.get(other_field_name, "").strip()
-
-                if "__other__" in selected_values and other_value:
-                    selected_values = [v for v in selected_values if v != "__other__"]
-                    selected_values.append(other_value)
-
-                if selected_values:
-                    ChallengeUserAnswer.objects.create(
-                        attempt=attempt,
-                        element=element,
-                        answer=",".join(selected_values)
-                    )
-                    new_answer_count += 1
-
-            elif element.element == 'radio':
-                answer_value = request.POST.get(field_name)
-                other_value = request.POST.get(other_field_name, "").strip()
-
-                if answer_value == "__other__" and other_value:
-                    answer_value = other_value
-
-                if answer_value:
-                    ChallengeUserAnswer.objects.create(
-                        attempt=attempt,
-                        element=element,
-                        answer=answer_value
-                    )
-                    new_answer_count += 1
-
-            else:  # input, textarea, date
-                answer_value = request.POST.get(field_name, "").strip()
-                if answer_value:
-                    ChallengeUserAnswer.objects.create(
-                        attempt=attempt,
-                        element=element,
-                        answer=answer_value
-                    )
-                    new_answer_count += 1
-
-        # Считаем общее количество попыток, включая эту
-        total_attempts = already_attempts_count + 1
+@login_required
+@require_POST
+def challenge_upload_complete(request):
+    """Завершает multipart-загрузку: JSON с token и parts [{PartNumber, ETag}]."""
+    try:
+        data = json.loads(request.body)
+        complete_upload(data.get('token', ''), request.user, data.get('parts', []))
+    except (ValueError, KeyError, ValidationError) as e:
+        message = e.messages[0] if isinstance(e, ValidationError) else 'Invalid request'
+        return JsonResponse({'status': 'error', 'message': message}, status=400)
 
-        required_attempts = challenge.min_answers_required
+    return JsonResponse({'status': 'success'})
 
-        if not user_choice.is_done and total_attempts >= required_attempts:
-            user_choice.is_done = True
-            user_choice.save()
 
-            user.points_count += challenge.points
-            user.save()
+@login_required
+@require_POST
+def submit_challenge_in_add(request, challenge_id):
+    challenge = get_object_or_404(Challenge, id=challenge_id)
 
-            content_type = ContentType.objects.get_for_model(Challenge)
-            content = Content.objects.filter(object_id=challenge.pk, content_type=content_type).first()
-            if content:
-                user.completed_content.add(content)
+    try:
+        # Ответы, выполнение челленджа и баллы — одной транзакцией
+        submit_attempt(request, challenge)
 
         return JsonResponse({
             'status': 'success',
@@ -1841,6 +1709,11 @@ def submit_challenge_in_add(request, challenge_id):
             'url': reverse('challenge_view_content', kwargs={'pk': challenge.id})
         })
 
+    except ValidationError as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': ' '.join(e.messages),
+        }, status=400)
     except Exception as e:
         print(f"Error while saving the answer: {str(e)}")
         return JsonResponse({
@@ -1861,7 +1734,7 @@ def edit_challenge_attempt(request, attempt_id):
     for ans in attempt.answers.all():
         if ans.element.element == "file" and ans.file:
             answers[ans.element.id] = {
-                'value': ans.file.url,
+                'value': ans.playback_url,
                 'basename': os.path.basename(ans.file.name)
             }
         elif ans.element.element == "checkbox":
@@ -1874,7 +1747,7 @@ def edit_challenge_attempt(request, attempt_id):
     elements_with_options = []
     for element in challenge.elements.filter(show_after_confirm=False):
         if element.element in ["radio", "checkbox"]:
-            options = parse_radio_values(element.value)
+            options = element.parsed_options
             value = answers.get(element.id)
 
             field_data = {
@@ -1956,80 +1829,7 @@ def update_challenge_attempt(request, attempt_id):
         # Логируем начальные данные
         logger.debug(f"Attempt ID: {attempt.id}, Challenge: {challenge.title}, User: {request.user}")
 
-        for element in challenge.elements.all():
-            field_name = f"field_{element.id}"
-            logger.debug(f"Processing element: {element.id} - {element.element}")
-
-            if element.element == "file":
-                # Обработка файлов
-                uploaded_file = request.FILES.get(field_name)
-                if uploaded_file:
-                    logger.debug(f"File uploaded: {uploaded_file.name}")
-                    answer, created = ChallengeUserAnswer.objects.get_or_create(
-                        attempt=attempt,
-                        element=element
-                    )
-                    if answer.file:
-                        answer.file.delete(save=False)
-                    answer.file = uploaded_file
-                    answer.save()
-            elif element.element == "checkbox":
-                # Обработка чекбоксов
-                selected_values = request.POST.getlist(field_name)
-                logger.debug(f"Selected checkbox values for element {element.id}: {selected_values}")
-
-                # Если выбрана опция "Other", проверяем введенное значение
-                if "__other__" in selected_values:
-                    other_value = request.POST.get(f"field_{element.id}_other")
-                    logger.debug(f"Received 'Other' value for checkbox: {other_value}")
-
-                    if other_value:  # Если введено значение для Other
-                        selected_values = [v for v in selected_values if v != "__other__"]  # Убираем __other__
-                        selected_values.append(other_value)  # Добавляем введенное значение
-                        logger.debug(f"Saving custom 'Other' value for checkboxes: {other_value}")
-
-                # Сохраняем выбранные значения
-                answer_value = ",".join(selected_values)
-                logger.debug(f"Saving checkbox answer: {answer_value}")
-                ChallengeUserAnswer.objects.update_or_create(
-                    attempt=attempt,
-                    element=element,
-                    defaults={'answer': answer_value}
-                )
-            elif element.element == "radio":
-                # Обработка радиокнопок
-                answer_value = request.POST.get(field_name)
-                logger.debug(f"Received radio value: {answer_value}")
-
-                if answer_value == "__other__":
-                    logger.debug(f"Other option selected for element {element.id}")
-                    other_value = request.POST.get(f"field_{element.id}_other")
-                    logger.debug(f"Received 'Other' value: {other_value}")
-
-                    if other_value:
-                        answer_value = other_value  # Если пользователь ввел значение в поле Other
-                        logger.debug(f"Saving custom 'Other' value: {other_value}")
-                    else:
-                        answer_value = "__other__"  # Если значение не введено, то сохраняем "__other__"
-
-                logger.debug(f"Saving radio answer: {answer_value}")
-                ChallengeUserAnswer.objects.update_or_create(
-                    attempt=attempt,
-                    element=element,
-                    defaults={'answer': answer_value}
-                )
-
-
-            else:
-                # Обработка остальных элементов
-                answer_value = request.POST.get(field_name)
-                if answer_value:
-                    logger.debug(f"Saving other answer: {answer_value}")
-                    ChallengeUserAnswer.objects.update_or_create(
-                        attempt=attempt,
-                        element=element,
-                        defaults={'answer': answer_value}
-                    )
+        update_attempt(request, attempt)
 
         redirect_url = reverse('challenge_view_content', kwargs={'pk': challenge.id})
         return JsonResponse({
@@ -2038,6 +1838,11 @@ def update_challenge_attempt(request, attempt_id):
             'url': redirect_url
         })
 
+    except ValidationError as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': ' '.join(e.messages),
+        }, status=400)
     except Exception as e:
         logger.error(f"Error occurred: {str(e)}")
         import traceback
@@ -2097,7 +1902,7 @@ def quiz_detail(request, pk):
     ).first()
     page_slug = content.page.slug if content and content.page else None
 
-    total_points = sum(q.points for q in quiz.questions.all())
+    total_points = quiz.total_points()
 
     return render(request, 'videos/quiz.html', {
         'quiz': quiz,
@@ -2116,7 +1921,7 @@ def quiz_detail_welcome(request, pk):
     ).first()
     page_slug = content.page.slug if content and content.page else None
 
-    total_points = sum(q.points for q in quiz.questions.all())
+    total_points = quiz.total_points()
 
     return render(request, 'videos/quiz_welcome.html', {
         'quiz': quiz,
@@ -2130,21 +1935,29 @@ def quiz_start(request, quiz_id):
     return render(request, 'quiz/quiz.html', {'quiz': quiz})
 
 
+@etag(lambda request, quiz_id: quiz_etag(quiz_id))
+def quiz_payload(request, quiz_id):
+    # Весь квиз одним запросом; клиент перепроверяет его по ETag (304, если квиз не менялся)
+    response = JsonResponse(get_quiz_payload(quiz_id))
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 def get_question(request, quiz_id, question_num):
-    quiz = get_object_or_404(Quiz, pk=quiz_id)
-    questions = quiz.questions.all().order_by('id')
+    payload = get_quiz_payload(quiz_id)
+    questions = payload['questions']
 
-    if question_num <= 0 or question_num > questions.count():
+    if question_num <= 0 or question_num > len(questions):
         return JsonResponse({'error': 'Invalid question number'}, status=400)
 
     question = questions[question_num - 1]
     data = {
-        'question': question.text,
-        'image': question.image.url if question.image else None,
-        'question_type': question.question_type,
-        'choices': question.choice_list if question.question_type in ['multiple', 'single'] else [],
+        'question': question['question'],
+        'image': question['image'],
+        'question_type': question['question_type'],
+        'choices': question['choices'],
         'current_question': question_num,
-        'total_questions': questions.count(),
+        'total_questions': len(questions),
     }
     return JsonResponse(data)
 
@@ -2176,13 +1989,12 @@ def quiz_results(request, pk):
         points_awarded_already = user_choice.points_awarded  # <- сохраняем в переменную до изменения!
 
         if not user_choice.points_awarded:
-            request.user.points_count += earned_points
+            award_points(request.user, earned_points, content_key(quiz), 'quiz')
             # Этот блок уже использует Content, но мы можем использовать нашу переменную content
             if content:  # Используем уже полученный content
                 request.user.completed_content.add(content)
-            request.user.save()
             user_choice.points_awarded = True
-            user_choice.save()
+            user_choice.save(update_fields=['points_awarded'])
 
         incorrect_answers = answers.filter(is_correct=False)
         incorrect_count = incorrect_answers.count()
@@ -2292,20 +2104,16 @@ def submit_answer(request):
                 return JsonResponse({'error': 'Missing quiz_id or answers'}, status=400)
 
             quiz = get_object_or_404(Quiz, pk=quiz_id)
-            questions = quiz.questions.all().order_by('id')
-
-            # Создаем или получаем запись QuizUserChoice
-            quiz_user_choice, created = QuizUserChoice.objects.get_or_create(
-                user=request.user,
-                quiz=quiz,
-                defaults={'submitted_at': timezone.now()}
-            )
+            # Вопросы загружаем один раз, дальше всё в памяти
+            questions = list(quiz.questions.all().order_by('id'))
 
-            # Сохраняем все ответы
+            # Проверяем ответы без обращений к базе; "1" и "01" — один вопрос,
+            # остаётся последний ответ (иначе ON CONFLICT заденет строку дважды)
+            quiz_answers = {}
             for question_num, user_answer in answers.items():
                 try:
                     question_num = int(question_num)
-                    if question_num <= 0 or question_num > questions.count():
+                    if question_num <= 0 or question_num > len(questions):
                         continue
 
                     question = questions[question_num - 1]
@@ -2321,19 +2129,33 @@ def submit_answer(request):
                         user_answers = set(user_answer.split(','))
                         is_correct = correct_answers == user_answers
 
-                    # Создаем или обновляем ответ
-                    QuizAnswer.objects.update_or_create(
-                        quiz_user_choice=quiz_user_choice,
+                    quiz_answers[question.pk] = QuizAnswer(
                         question=question,
-                        defaults={
-                            'user_answer': user_answer,
-                            'is_correct': is_correct
-                        }
+                        user_answer=user_answer,
+                        is_correct=is_correct
                     )
 
                 except (ValueError, IndexError):
                     continue
 
+            with transaction.atomic():
+                # Создаем или получаем запись QuizUserChoice
+                quiz_user_choice, created = QuizUserChoice.objects.get_or_create(
+                    user=request.user,
+                    quiz=quiz,
+                    defaults={'submitted_at': timezone.now()}
+                )
+
+                # Все ответы одним INSERT ... ON CONFLICT DO UPDATE
+                for quiz_answer in quiz_answers.values():
+                    quiz_answer.quiz_user_choice = quiz_user_choice
+                QuizAnswer.objects.bulk_create(
+                    list(quiz_answers.values()),
+                    update_conflicts=True,
+                    unique_fields=['quiz_user_choice', 'question'],
+                    update_fields=['user_answer', 'is_correct'],
+                )
+
             content_type = ContentType.objects.get_for_model(Quiz)
             content = Content.objects.filter(
                 object_id=quiz.pk,
@@ -13,13 +13,16 @@ from apps.users.models import (
     ChitChat, ChitChatOption, ChitChatUserChoice,
     Challenge, ChallengeElement, ChallengeUserAnswer, ChallengeUserChoice, ChitChatAnswer, ChallengeDisplaySettings,
     TextFieldDisplayOrder, TableColumnSetting, ChallengeUserAttempt, Schools, UserSchool, QuizQuestion, Quiz,
-    QuizUserChoice, QuizAnswer, Invitation, Glossary, Favourites, Rewards, UserReward, Page)
+    QuizUserChoice, QuizAnswer, Invitation, Glossary, Favourites, Rewards, UserReward, Page, PointsTransaction)
 from import_export.admin import ExportMixin
 from import_export import resources, fields
 from django.contrib.admin import SimpleListFilter
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext_lazy as _
 
+from apps.users.content_resolver import ContentResolver, get_content_object
+
 class UserResource(resources.ModelResource):
     class Meta:
         model = User
@@ -143,6 +146,32 @@ class SchoolsAdmin(ExportAdminMixin):
     search_fields = ('name', 'code')
 
 
+class ResolvedObjectsChangeList(ChangeList):
+    """Список, в котором объекты GenericForeignKey строк страницы загружены пачкой."""
+
+    def get_results(self, request):
+        super().get_results(request)
+        # list() заполняет кэш самого queryset, шаблон и formset возьмут те же объекты
+        self.model_admin.resolve_objects(self.result_list)
+
+
+class GenericObjectAdminMixin:
+    generic_field = None
+
+    def get_changelist(self, request, **kwargs):
+        return ResolvedObjectsChangeList
+
+    def resolve_objects(self, rows):
+        return ContentResolver().attach(rows, self.generic_field)
+
+    def linked_object_link(self, related_obj):
+        url = reverse(
+            f'admin:{related_obj._meta.app_label}_{related_obj._meta.model_name}_change',
+            args=[related_obj.pk]
+        )
+        return format_html('<a href="{}">{}</a>', url, str(related_obj))
+
+
 class SpecificContentTypeFilter(SimpleListFilter):
     title = 'content type'
     parameter_name = 'content_type'
@@ -168,13 +197,14 @@ class PageAdmin(admin.ModelAdmin):
 
 
 @admin.register(Content)
-class ContentAdmin(admin.ModelAdmin):
+class ContentAdmin(GenericObjectAdminMixin, admin.ModelAdmin):
     form = ContentAdminForm
     list_display = ('page', 'content_type', 'safe_linked_object', 'order', 'always_available')
     list_editable = ('order',)
-    readonly_fields = ('poster_base64', 'safe_linked_object')
-    fields = ['page', 'order', 'content_type', 'object_id', 'always_available', 'poster_base64', 'safe_linked_object']
+    readonly_fields = ('safe_linked_object',)
+    fields = ['page', 'order', 'content_type', 'object_id', 'always_available', 'safe_linked_object']
     list_filter = (SpecificContentTypeFilter, 'page')
+    generic_field = 'value'
 
     def safe_linked_object(self, obj):
         if not obj.content_type:
@@ -184,15 +214,10 @@ class ContentAdmin(admin.ModelAdmin):
             if not model_class:
                 return f"Model {obj.content_type.model} not found"
             if obj.object_id:
-                try:
-                    related_obj = model_class._base_manager.get(pk=obj.object_id)
-                    url = reverse(
-                        f'admin:{related_obj._meta.app_label}_{related_obj._meta.model_name}_change',
-                        args=[obj.object_id]
-                    )
-                    return format_html('<a href="{}">{}</a>', url, str(related_obj))
-                except model_class.DoesNotExist:
+                related_obj = get_content_object(obj, 'value')
+                if related_obj is None:
                     return f"Object {obj.object_id} not found"
+                return self.linked_object_link(related_obj)
             return "No object_id"
         except Exception as e:
             return f"Error: {str(e)}"
@@ -204,16 +229,12 @@ class ContentAdmin(admin.ModelAdmin):
 class FunFactAdmin(ExportAdminMixin):
     list_display = ('title', 'points')
     search_fields = ('title', 'points')
-    readonly_fields = ('photo_base64',)
     readonly_fields = ('photo_preview',)
     list_filter = ('points',)
 
-    def get_readonly_fields(self, request, obj=None):
-        return ('photo_base64',) + self.readonly_fields
-
     def photo_preview(self, obj):
-        if obj.photo_base64:
-            return mark_safe(f'<img src="data:image/jpeg;base64,{obj.photo_base64}" width="150" />')
+        if obj.photo_asset_id:
+            return format_html('<img src="{}" width="150" />', obj.photo_admin_url)
         elif obj.photo:
             return mark_safe(f'<img src="{obj.photo.url}" width="150" />')
         return "No photo"
@@ -223,22 +244,18 @@ class FunFactAdmin(ExportAdminMixin):
 
 @admin.register(Video)
 class VideoAdmin(ExportAdminMixin):
-    list_display = ('title', 'points', 'video_link')
+    list_display = ('title', 'points', 'duration_seconds', 'video_link')
     fields = (
         'title', 'description', 'video_file', 'video_link', 'poster_url',
-        'duration', 'points', 'poster_preview'
+        'duration', 'duration_seconds', 'points', 'poster_preview'
     )
     search_fields = ('title', 'points')
-    readonly_fields = ('poster_preview', 'poster_base64', 'video_link')
+    readonly_fields = ('poster_preview', 'video_link', 'duration_seconds')
     list_filter = ('points',)
 
-    def get_readonly_fields(self, request, obj=None):
-        # Добавляем poster_base64 и video_link в readonly поля всегда
-        return super().get_readonly_fields(request, obj)
-
     def poster_preview(self, obj):
-        if obj.poster_base64:
-            return format_html('<img src="data:image/jpeg;base64,{}" width="150" />', obj.poster_base64)
+        if obj.poster_asset_id:
+            return format_html('<img src="{}" width="150" />', obj.poster_admin_url)
         elif obj.poster_url:
             return format_html('<img src="{}" width="150" />', obj.poster_url.url)
         return "No poster"
@@ -247,10 +264,8 @@ class VideoAdmin(ExportAdminMixin):
 
     def video_link(self, obj):
         if obj.video_file:
-            # Берём имя файла, заменяем пробелы на _
-            filename = os.path.basename(obj.video_file.name).replace(' ', '_')
-            url = f"https://link.storjshare.io/s/jx3blensqenp6hmoiz444ldnnrxq/videobucket/{filename}"
-            return format_html('<a href="{}" target="_blank">{}</a>', url, filename)
+            filename = os.path.basename(obj.video_file.name)
+            return format_html('<a href="{}" target="_blank">{}</a>', obj.stream_url, filename)
         return "No video"
 
     video_link.short_description = 'Video Link'
@@ -344,7 +359,7 @@ class ExportNestedAdmin(ExportMixin, nested_admin.NestedModelAdmin):
 @admin.register(Challenge)
 class ChallengeAdmin(ExportNestedAdmin):
     list_display = ('title', 'points')
-    readonly_fields = ('photo_preview', 'picture_base64')
+    readonly_fields = ('photo_preview',)
     search_fields = ('title',)
     list_filter = ('points',)
 
@@ -380,8 +395,8 @@ class ChallengeAdmin(ExportNestedAdmin):
         return inline_instances
 
     def photo_preview(self, obj):
-        if obj.picture_base64:
-            return mark_safe(f'<img src="data:image/jpeg;base64,{obj.picture_base64}" width="150" />')
+        if obj.picture_asset_id:
+            return format_html('<img src="{}" width="150" />', obj.picture_admin_url)
         elif obj.picture:
             return mark_safe(f'<img src="{obj.picture.url}" width="150" />')
         return "No photo"
@@ -397,9 +412,8 @@ class ChallengeUserAnswerInline(nested_admin.NestedTabularInline):
 
     def file_link(self, obj):
         if obj.file:
-            filename = os.path.basename(obj.file.name).replace(' ', '_')
-            url = f"https://link.storjshare.io/s/ju35potrmsjldivqbuhgnygn5lqq/videobucket/usersvideo/{filename}"
-            return format_html('<a href="{}" target="_blank">{}</a>', url, filename)
+            filename = os.path.basename(obj.file.name)
+            return format_html('<a href="{}" target="_blank">{}</a>', obj.playback_url, filename)
         return "Нет файла"
 
     file_link.short_description = 'File (Video)'
@@ -472,6 +486,15 @@ class RewardsAdmin(ExportAdminMixin):
     list_filter = ('points_needed',)
 
 
+@admin.register(PointsTransaction)
+class PointsTransactionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'amount', 'reason', 'key', 'created_at')
+    search_fields = ('user__email', 'key')
+    list_filter = ('reason', 'created_at')
+    list_select_related = ('user',)
+    readonly_fields = ('user', 'amount', 'reason', 'key', 'created_at')
+
+
 @admin.register(Glossary)
 class GlossaryAdmin(admin.ModelAdmin):
     list_display = ("term", "category", "color_display", "order")
@@ -530,7 +553,7 @@ class ContentPageFilter(SimpleListFilter):
 
 
 @admin.register(Favourites)
-class FavouritesAdmin(admin.ModelAdmin):
+class FavouritesAdmin(GenericObjectAdminMixin, admin.ModelAdmin):
     list_display = (
         'user',
         'safe_linked_object',
@@ -558,12 +581,27 @@ class FavouritesAdmin(admin.ModelAdmin):
             )
         }),
     )
+    generic_field = 'content_object'
+
+    def resolve_objects(self, rows):
+        rows = super().resolve_objects(rows)
+        # страницы контента для всех строк одним запросом
+        pages = {}
+        contents = Content.objects.filter(
+            content_type_id__in={row.content_type_id for row in rows},
+            object_id__in={row.object_id for row in rows},
+        ).select_related('page').order_by('id')
+        for content in contents:
+            pages.setdefault((content.content_type_id, content.object_id), content.page)
+        for row in rows:
+            row.linked_content_page = pages.get((row.content_type_id, row.object_id))
+        return rows
 
     def poster_preview(self, obj):
-        poster = getattr(obj, 'poster_base64', None)
+        poster = getattr(obj.content_object, 'poster_admin_url', None)
         if poster:
             return format_html(
-                '<img src="data:image/jpeg;base64,{}" style="max-height:50px; max-width:80px;" />',
+                '<img src="{}" style="max-height:50px; max-width:80px;" />',
                 poster
             )
         return "-"
@@ -574,26 +612,16 @@ class FavouritesAdmin(admin.ModelAdmin):
         if not obj.content_type:
             return "-"
         try:
-            model_class = obj.content_type.model_class()
-            related_obj = model_class.objects.get(pk=obj.object_id)
-            url = reverse(
-                f'admin:{related_obj._meta.app_label}_{related_obj._meta.model_name}_change',
-                args=[obj.object_id]
-            )
-            return format_html('<a href="{}">{}</a>', url, str(related_obj))
+            related_obj = get_content_object(obj, 'content_object')
+            return self.linked_object_link(related_obj) if related_obj else "-"
         except Exception:
             return "-"
 
     @admin.display(description="Page")
     def content_page(self, obj):
-        try:
-            content = Content.objects.get(
-                content_type=obj.content_type,
-                object_id=obj.object_id
-            )
-            return content.get_page_display() if hasattr(content, "get_page_display") else content.page
-        except Content.DoesNotExist:
-            return "-"
+        if not hasattr(obj, 'linked_content_page'):
+            self.resolve_objects([obj])
+        return obj.linked_content_page or "-"
 
 
 
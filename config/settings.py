@@ -213,6 +213,18 @@ DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL')
 SUPABASE_URL = env('SUPABASE_URL')
 SUPABASE_KEY = env('SUPABASE_KEY')
 
+# HTTP-клиент SupabaseStorage: таймауты (сек) и повторы на 5xx/429
+SUPABASE_STORAGE_CONNECT_TIMEOUT = env.float('SUPABASE_STORAGE_CONNECT_TIMEOUT', default=3.05)
+SUPABASE_STORAGE_READ_TIMEOUT = env.float('SUPABASE_STORAGE_READ_TIMEOUT', default=30)
+SUPABASE_STORAGE_MAX_RETRIES = env.int('SUPABASE_STORAGE_MAX_RETRIES', default=3)
+SUPABASE_STORAGE_BACKOFF = env.float('SUPABASE_STORAGE_BACKOFF', default=0.5)
+SUPABASE_STORAGE_POOL_SIZE = env.int('SUPABASE_STORAGE_POOL_SIZE', default=10)
+# Сколько байт скачанного файла держать в памяти, прежде чем уйти на диск
+SUPABASE_STORAGE_SPOOL_SIZE = env.int('SUPABASE_STORAGE_SPOOL_SIZE', default=5 * 1024 * 1024)
+# TTL (сек) метаданных объектов: в общем кэше и в памяти процесса
+SUPABASE_STORAGE_METADATA_TTL = env.int('SUPABASE_STORAGE_METADATA_TTL', default=300)
+SUPABASE_STORAGE_LOCAL_METADATA_TTL = env.int('SUPABASE_STORAGE_LOCAL_METADATA_TTL', default=10)
+
 DEFAULT_FILE_STORAGE = 'utils.supabase_storage.SupabaseStorage'
 
 try:
@@ -244,10 +256,30 @@ STORJ_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 STORJ_ACCESS_GRANT = os.getenv('STORJ_ACCESS_GRANT ')
 
 CELERY_BROKER_URL = os.getenv("REDIS_URL")
+
+# Лидерборды в sorted set'ах Redis; без REDIS_URL — локальная замена в памяти
+LEADERBOARD_REDIS_URL = os.getenv("REDIS_URL")
+
+# Общий кэш между web и worker (манифесты страниц, метаданные хранилища)
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv("REDIS_URL"),
+        }
+    }
 CELERY_RESULT_BACKEND = "rpc://"
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 
+CELERY_BEAT_SCHEDULE = {
+    # счётчики ответов Chit Chat сверяются с ChitChatAnswer раз в час (процесс beat в Procfile)
+    'reconcile-chitchat-tallies': {
+        'task': 'apps.users.tasks.reconcile_chitchat_tallies',
+        'schedule': 60 * 60,
+    },
+}
+
 DATA_UPLOAD_MAX_MEMORY_SIZE = 314572800
 FILE_UPLOAD_MAX_MEMORY_SIZE = 314572800
 
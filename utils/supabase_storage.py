@@ -1,13 +1,212 @@
 # utils/supabase_storage.py
 import os
+import time
+import hashlib
+import logging
+import threading
 import mimetypes
+import tempfile
+from collections import OrderedDict
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.core.files.storage import Storage
-from django.core.files.base import ContentFile
+from django.core.files.base import File
 from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_http_date_safe
+from datetime import datetime, timezone as dt_timezone
 from environ import ImproperlyConfigured
 from django.utils.deconstruct import deconstructible
 
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+# Метаданные объектов в памяти процесса: key -> (expires_at, meta), LRU
+# не больше SUPABASE_STORAGE_LOCAL_METADATA_SIZE записей
+_metadata = OrderedDict()
+_metadata_lock = threading.Lock()
+
+# Задержки по операциям: {'save': {'count', 'errors', 'total_ms', 'max_ms'}, ...}
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Один пул keep-alive соединений на процесс, общий для всех бакетов.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=getattr(settings, 'SUPABASE_STORAGE_MAX_RETRIES', 3),
+                    backoff_factor=getattr(settings, 'SUPABASE_STORAGE_BACKOFF', 0.5),
+                    status_forcelist=RETRY_STATUSES,
+                    # PUT здесь не повторяется: urllib3 не перематывает тело, и повтор
+                    # потокового тела ушёл бы пустым. Повторы загрузки — в SupabaseStorage._upload
+                    allowed_methods=frozenset(['GET', 'HEAD', 'DELETE']),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                pool_size = getattr(settings, 'SUPABASE_STORAGE_POOL_SIZE', 10)
+                adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def get_timeout():
+    return (
+        getattr(settings, 'SUPABASE_STORAGE_CONNECT_TIMEOUT', 3.05),
+        getattr(settings, 'SUPABASE_STORAGE_READ_TIMEOUT', 30),
+    )
+
+
+def record_latency(operation, elapsed_ms, failed=False):
+    with _stats_lock:
+        entry = _stats.setdefault(operation, {'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        entry['count'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+        if failed:
+            entry['errors'] += 1
+
+
+def get_latency_stats():
+    with _stats_lock:
+        return {
+            operation: {**entry, 'avg_ms': entry['total_ms'] / entry['count']}
+            for operation, entry in _stats.items()
+        }
+
+
+class SupabaseFile(File):
+    """
+    Файл из бакета, который скачивается потоком только при обращении.
+    chunks() и iter_range() не держат файл в памяти; read()/seek()
+    работают через временный файл, который уходит на диск после
+    SUPABASE_STORAGE_SPOOL_SIZE байт.
+    """
+
+    def __init__(self, name, storage, mode='rb'):
+        self.name = name
+        self.mode = mode
+        self._storage = storage
+        self._file = None
+        self._size = None
+
+    def _get_file(self):
+        if self._file is None:
+            spool_size = getattr(settings, 'SUPABASE_STORAGE_SPOOL_SIZE', 5 * 1024 * 1024)
+            self._file = tempfile.SpooledTemporaryFile(max_size=spool_size)
+            for chunk in self._stream():
+                self._file.write(chunk)
+            self._file.seek(0)
+        return self._file
+
+    def _set_file(self, value):
+        self._file = value
+
+    file = property(_get_file, _set_file)
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._size = self._storage.size(self.name)
+        return self._size
+
+    @size.setter
+    def size(self, value):
+        self._size = value
+
+    def _stream(self, start=None, end=None, chunk_size=None):
+        headers = {}
+        if start is not None:
+            headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+
+        response = self._storage._request(
+            'open', 'GET', self._storage._object_url(self.name), headers=headers, stream=True
+        )
+        with response:
+            if not response.ok:
+                raise IOError(f"Unable to open file: {self.name}")
+            if start is None and 'Content-Length' in response.headers:
+                self._size = int(response.headers['Content-Length'])
+            yield from response.iter_content(chunk_size=chunk_size or self.DEFAULT_CHUNK_SIZE)
+
+    def chunks(self, chunk_size=None):
+        # если файл уже скачан, читаем его; иначе идём потоком мимо буфера
+        if self._file is not None:
+            return super().chunks(chunk_size)
+        return self._stream(chunk_size=chunk_size)
+
+    def iter_range(self, start, end=None, chunk_size=None):
+        """Байты [start, end] (end включительно) через HTTP Range."""
+        return self._stream(start, end, chunk_size)
+
+    def open(self, mode=None):
+        if self._file is not None:
+            self._file.seek(0)
+        if mode is not None:
+            self.mode = mode
+        return self
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def closed(self):
+        return self._file is None or self._file.closed
+
+
+def _metadata_key(bucket, name):
+    digest = hashlib.sha1(name.encode()).hexdigest()
+    return f"supabase_meta:{bucket}:{digest}"
+
+
+def get_cached_metadata(key):
+    now = time.monotonic()
+    with _metadata_lock:
+        entry = _metadata.get(key)
+        if entry and entry[0] > now:
+            _metadata.move_to_end(key)
+            return entry[1]
+        if entry:
+            del _metadata[key]
+
+    meta = cache.get(key)
+    if meta is not None:
+        _remember_locally(key, meta)
+    return meta
+
+
+def set_cached_metadata(key, meta):
+    cache.set(key, meta, getattr(settings, 'SUPABASE_STORAGE_METADATA_TTL', 300))
+    _remember_locally(key, meta)
+
+
+def _remember_locally(key, meta):
+    # локальная копия живёт недолго: другие процессы её не сбрасывают
+    ttl = getattr(settings, 'SUPABASE_STORAGE_LOCAL_METADATA_TTL', 10)
+    max_size = getattr(settings, 'SUPABASE_STORAGE_LOCAL_METADATA_SIZE', 1024)
+    with _metadata_lock:
+        _metadata[key] = (time.monotonic() + ttl, meta)
+        _metadata.move_to_end(key)
+        while len(_metadata) > max_size:
+            _metadata.popitem(last=False)
+
+
 @deconstructible
 class SupabaseStorage(Storage):
     def __init__(self, bucket_name):
@@ -26,52 +225,138 @@ class SupabaseStorage(Storage):
     def _get_full_path(self, name):
         return f"{self.bucket}/{name}"
 
+    def _request(self, operation, method, url, **kwargs):
+        kwargs.setdefault('timeout', get_timeout())
+        headers = {**self.headers, **kwargs.pop('headers', {})}
+
+        started = time.monotonic()
+        failed = True
+        try:
+            response = get_session().request(method, url, headers=headers, **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            elapsed_ms = (time.monotonic() - started) * 1000
+            record_latency(operation, elapsed_ms, failed)
+            logger.debug("supabase %s %s/%s took %.1f ms", operation, self.bucket, url.rsplit('/', 1)[-1], elapsed_ms)
+
+    def _upload(self, url, body, headers):
+        """
+        PUT с повторами, если тело можно перемотать (bytes или файл с seek):
+        перед каждой попыткой файл встаёт на начало, x-upsert делает повтор
+        безопасным. Потоковое тело отправляется один раз.
+        """
+        rewindable = isinstance(body, bytes) or (hasattr(body, 'seekable') and body.seekable())
+        retries = getattr(settings, 'SUPABASE_STORAGE_MAX_RETRIES', 3) if rewindable else 0
+        backoff = getattr(settings, 'SUPABASE_STORAGE_BACKOFF', 0.5)
+
+        for attempt in range(retries + 1):
+            if hasattr(body, 'seek'):
+                body.seek(0)
+            delay = backoff * (2 ** attempt)
+            try:
+                response = self._request('save', 'PUT', url, data=body, headers=headers)
+            except requests.ConnectionError:
+                if attempt == retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = int(retry_after)
+                response.close()
+            logger.warning("supabase save to %s failed, retry %d of %d", self.bucket, attempt + 1, retries)
+            time.sleep(delay)
+
+    def _object_url(self, name):
+        return f"{self.base_url}/storage/v1/object/{self._get_full_path(name)}"
+
     def _save(self, name, content):
-        file_path = self._get_full_path(name)
-        upload_url = f"{self.base_url}/storage/v1/object/{file_path}"
+        upload_url = self._object_url(name)
         print(f"Trying to save to bucket: {self.bucket}")
 
         content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        headers = {
+            "Content-Type": content_type,
+            "x-upsert": "true",
+        }
 
-        # Перемотка файла перед чтением
+        # Файл с seek уходит потоком как есть и перематывается перед каждой
+        # попыткой; остальное — chunked-телом по кускам, один раз, без чтения
+        # целиком в память
+        size = getattr(content, 'size', None)
         if hasattr(content, 'seekable') and content.seekable():
-            content.seek(0)
-
-        response = requests.put(
-            upload_url,
-            data=content.read(),
-            headers={
-                **self.headers,
-                "Content-Type": content_type,
-                "x-upsert": "true",
-            },
-        )
+            if size is not None:
+                headers["Content-Length"] = str(size)
+            body = content
+        else:
+            # без Content-Length: requests сам отправит тело с Transfer-Encoding: chunked
+            body = content.chunks()
+
+        response = self._upload(upload_url, body, headers)
 
         if not response.ok:
             error_msg = f"Upload failed: {response.status_code} - {response.text}"
             print(error_msg)
             raise Exception(error_msg)
 
+        # x-upsert мог перезаписать объект: пишем в кэш новое состояние,
+        # время изменения перечитается при первом запросе
+        set_cached_metadata(_metadata_key(self.bucket, name), {'exists': True, 'size': size, 'modified': None})
         return name
 
     def _open(self, name, mode='rb'):
-        from django.core.files.base import ContentFile
-        download_url = f"{self.base_url}/storage/v1/object/{self.bucket}/{name}"
-        response = requests.get(download_url, headers=self.headers)
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            raise ValueError("SupabaseStorage files are read-only, use save() to upload.")
+        return SupabaseFile(name, self, mode)
+
+    def _get_metadata(self, name, field=None):
+        """
+        exists/size/modified одного объекта. Берётся из кэша, а при промахе
+        (или если нужного поля в кэше нет) — одним HEAD-запросом.
+        """
+        key = _metadata_key(self.bucket, name)
+        meta = get_cached_metadata(key)
+        if meta is not None and (field is None or not meta['exists'] or meta.get(field) is not None):
+            return meta
+
+        response = self._request('metadata', 'HEAD', self._object_url(name))
         if response.ok:
-            return ContentFile(response.content)
-        raise IOError(f"Unable to open file: {name}")
+            length = response.headers.get('Content-Length')
+            meta = {
+                'exists': True,
+                'size': int(length) if length is not None else None,
+                'modified': parse_http_date_safe(response.headers.get('Last-Modified', '')),
+            }
+        elif response.status_code in (400, 404):
+            meta = {'exists': False, 'size': None, 'modified': None}
+        else:
+            raise IOError(f"Unable to get metadata of file: {name} ({response.status_code})")
 
+        set_cached_metadata(key, meta)
+        return meta
+
+    def size(self, name):
+        meta = self._get_metadata(name, 'size')
+        if not meta['exists'] or meta['size'] is None:
+            raise IOError(f"Unable to get size of file: {name}")
+        return meta['size']
+
+    def get_modified_time(self, name):
+        meta = self._get_metadata(name, 'modified')
+        if not meta['exists'] or meta['modified'] is None:
+            raise IOError(f"Unable to get modified time of file: {name}")
+        return datetime.fromtimestamp(meta['modified'], tz=dt_timezone.utc)
 
     def url(self, name):
         return f"{self.base_url}/storage/v1/object/public/{self.bucket}/{name}"
 
     def exists(self, name):
-        check_url = f"{self.base_url}/storage/v1/object/info/{self.bucket}/{name}"
-        response = requests.get(check_url, headers=self.headers)
-        return response.status_code == 200
+        return self._get_metadata(name)['exists']
 
     def delete(self, name):
-        delete_url = f"{self.base_url}/storage/v1/object/{self.bucket}/{name}"
-        response = requests.delete(delete_url, headers=self.headers)
-        return response.ok
\ No newline at end of file
+        response = self._request('delete', 'DELETE', self._object_url(name))
+        if response.ok:
+            set_cached_metadata(_metadata_key(self.bucket, name), {'exists': False, 'size': None, 'modified': None})
+        return response.ok